@@ -9,27 +9,1846 @@ License: BSD 3-Clause
 """
 
 import base64
-import cv2
-import numpy as np
-from PIL import Image
-import pytesseract
-import requests
+import importlib
 import time
 import argparse
 import os
 import json
+import io
+import sys
+import hashlib
+import threading
 from io import BytesIO
-from collections import Counter
+from collections import Counter, OrderedDict, deque
+from contextlib import redirect_stdout
+from datetime import datetime
 
 __version__ = "1.0.0"
 
-class S0lvCaptcha:
+
+class LazyModule:
+    """Placeholder for a heavy module, imported on first attribute access
+
+    On import, the module replaces the placeholder under its global name,
+    so later accesses cost nothing extra.
+    """
+
+    def __init__(self, module_name, global_name):
+        self.module_name = module_name
+        self.global_name = global_name
+
+    def __getattr__(self, attribute):
+        module = importlib.import_module(self.module_name)
+        globals()[self.global_name] = module
+        return getattr(module, attribute)
+
+
+# Only the code paths that need them pay for these imports
+cv2 = LazyModule('cv2', 'cv2')
+np = LazyModule('numpy', 'np')
+Image = LazyModule('PIL.Image', 'Image')
+pytesseract = LazyModule('pytesseract', 'pytesseract')
+requests = LazyModule('requests', 'requests')
+
+tesserocr = None
+
+
+def load_tesserocr():
+    """tesserocr module, None when it is not installed"""
+    global tesserocr
+    if tesserocr is None:
+        try:
+            tesserocr = importlib.import_module('tesserocr')
+        except ImportError:
+            tesserocr = False
+        except ValueError:
+            # tesserocr >= 2.8 loads cysignals, which installs signal handlers: main thread only
+            return None
+    return tesserocr or None
+
+
+class TesseractEngine:
+    """OCR backend that reuses initialized libtesseract handles.
+
+    Handles are pooled per (oem, language, init-only variables) and shared
+    by every preprocessing variant and config that maps to it. Handles are
+    not thread safe, so a call checks one out of the pool and returns it
+    afterwards; the pool grows to the number of concurrent calls. close()
+    releases every handle. When
+    tesserocr is not installed, or a handle cannot be initialized, calls
+    fall back to pytesseract (one tesseract process per call).
+    """
+
+    # Variables that tesseract only reads while initializing a handle
+    INIT_ONLY_VARIABLES = ('load_system_dawg', 'load_freq_dawg')
+
+    def __init__(self, lang='eng', tessdata_path=None, use_native=True):
+        self.lang = lang
+        self.tessdata_path = tessdata_path or os.environ.get('TESSDATA_PREFIX')
+        self.use_native = use_native
+        self.idle = {}
+        self.apis = []
+        self.failed = set()
+        self.lock = threading.Lock()
+        # OCR calls run on worker threads, where tesserocr cannot be imported
+        if use_native and threading.current_thread() is threading.main_thread():
+            load_tesserocr()
+
+    @staticmethod
+    def parse_config(config):
+        """Split a pytesseract config string into psm, oem and variables"""
+        psm, oem, variables = 3, 3, {}
+        tokens = config.split()
+        i = 0
+        while i < len(tokens):
+            token = tokens[i]
+            if token == '--psm' and i + 1 < len(tokens):
+                psm = int(tokens[i + 1])
+                i += 1
+            elif token == '--oem' and i + 1 < len(tokens):
+                oem = int(tokens[i + 1])
+                i += 1
+            elif token == '-c' and i + 1 < len(tokens) and '=' in tokens[i + 1]:
+                name, value = tokens[i + 1].split('=', 1)
+                variables[name] = value
+                i += 1
+            i += 1
+        return psm, oem, variables
+
+    def get_api(self, key):
+        """Check out an idle handle for key (oem, language, init variables), creating one if none is idle"""
+        with self.lock:
+            if key in self.failed:
+                return None
+            idle = self.idle.get(key)
+            if idle:
+                return idle.pop()
+        oem, lang, init_variables = key
+        kwargs = {'lang': lang, 'oem': oem}
+        if init_variables:
+            kwargs['variables'] = dict(init_variables)
+        if self.tessdata_path:
+            kwargs['path'] = self.tessdata_path
+        try:
+            api = load_tesserocr().PyTessBaseAPI(**kwargs)
+        except Exception:
+            with self.lock:
+                self.failed.add(key)
+            return None
+        with self.lock:
+            self.apis.append(api)
+        return api
+
+    def release_api(self, key, api):
+        """Return a checked-out handle to the pool"""
+        with self.lock:
+            if api in self.apis:
+                self.idle.setdefault(key, []).append(api)
+
+    @staticmethod
+    def set_image(api, img):
+        """Hand a PIL image or a uint8 numpy array to a native handle
+
+        Arrays go in as raw pixel bytes; PIL images are re-encoded by
+        tesserocr. Returns the buffer Tesseract reads from, which must stay
+        referenced until recognition has run.
+        """
+        if isinstance(img, np.ndarray):
+            img = np.ascontiguousarray(img, dtype=np.uint8)
+            height, width = img.shape[:2]
+            bytes_per_pixel = 1 if img.ndim == 2 else img.shape[2]
+            buffer = img.tobytes()
+            api.SetImageBytes(buffer, width, height, bytes_per_pixel, width * bytes_per_pixel)
+            return buffer
+        api.SetImage(img)
+        return img
+
+    def native_image_to_string(self, img, config):
+        """Run one recognition on a shared handle, None if unavailable"""
+        return self.native_read(img, config, lambda api: api.GetUTF8Text())
+
+    def native_image_to_data(self, img, config):
+        """Word boxes and confidences as Tesseract TSV, None if unavailable"""
+        return self.native_read(img, config, lambda api: api.GetTSVText(0))
+
+    def native_read(self, img, config, read, extra_variables=None):
+        """Recognize img on a shared handle and return read(api)"""
+        psm, oem, variables = self.parse_config(config)
+        variables.update(extra_variables or {})
+        init_variables = {k: v for k, v in variables.items() if k in self.INIT_ONLY_VARIABLES}
+        key = (oem, self.lang, tuple(sorted(init_variables.items())))
+        api = self.get_api(key)
+        if api is None:
+            return None
+
+        # Runtime variables stick to the handle, so restore them afterwards
+        previous = {}
+        try:
+            api.SetPageSegMode(psm)
+            for name, value in variables.items():
+                if name in init_variables:
+                    continue
+                previous[name] = api.GetVariableAsString(name)
+                api.SetVariable(name, value)
+            buffer = self.set_image(api, img)
+            text = read(api)
+            del buffer
+            return text
+        finally:
+            for name, value in previous.items():
+                api.SetVariable(name, value or '')
+            api.Clear()
+            self.release_api(key, api)
+
+    @property
+    def native(self):
+        """True when calls run in-process through tesserocr"""
+        return self.use_native and load_tesserocr() is not None
+
+    def image_to_string(self, img, config=''):
+        """Drop-in replacement for pytesseract.image_to_string (PIL image or numpy array)"""
+        if self.native:
+            text = self.native_image_to_string(img, config)
+            if text is not None:
+                return text
+        return pytesseract.image_to_string(img, config=config)
+
+    def image_to_data(self, img, config=''):
+        """Word-level TSV like pytesseract.image_to_data (header line optional)"""
+        if self.native:
+            tsv = self.native_image_to_data(img, config)
+            if tsv is not None:
+                return tsv
+        return pytesseract.image_to_data(img, config=config)
+
+    def image_to_symbols(self, img, config=''):
+        """Per-character alternatives as [[(char, confidence), ...], ...], best first
+
+        Word breaks are [(' ', 100.0)] entries. Needs tesserocr (alternatives
+        come from the LSTM choice lists); None when it is unavailable.
+        """
+        if not self.native:
+            return None
+
+        def read(api):
+            api.Recognize()
+            level = tesserocr.RIL.SYMBOL
+            symbols = []
+            for symbol in tesserocr.iterate_level(api.GetIterator(), level):
+                best = symbol.GetUTF8Text(level)
+                if not best:
+                    continue
+                if symbols and symbol.IsAtBeginningOf(tesserocr.RIL.WORD):
+                    symbols.append([(' ', 100.0)])
+                choices = [(best, symbol.Confidence(level))]
+                for choice in symbol.GetChoiceIterator():
+                    text = choice.GetUTF8Text()
+                    if text and text != best:
+                        choices.append((text, choice.Confidence()))
+                symbols.append(choices)
+            return symbols
+
+        return self.native_read(img, config, read, {'lstm_choice_mode': '2'})
+
+    def close(self):
+        """Release every native handle (handles still checked out are ended too)"""
+        with self.lock:
+            for api in self.apis:
+                api.End()
+            self.apis = []
+            self.idle = {}
+            self.failed = set()
+
+
+class IncrementalConsensus:
+    """Vote counts over readings, updated in O(1) as each reading arrives
+
+    Besides exact-match counts it keeps a solution -> sources index and,
+    per reading length, per-position character votes, so readings that
+    are each partly wrong can still agree on a combined answer.
+    """
+
     def __init__(self):
+        self.counts = Counter()
+        self.sources = {}
+        self.order = {}
+        self.total = 0
+        self.top = None
+        self.top_count = 0
+        self.second_count = 0
+        self.lengths = Counter()
+        self.positions = {}
+
+    def add(self, solution, source=None):
+        """Count one more reading (source is kept in the solution's index)"""
+        if solution not in self.order:
+            self.order[solution] = len(self.order)
+            self.sources[solution] = []
+        self.counts[solution] += 1
+        self.sources[solution].append(source)
+        self.total += 1
+
+        # Leader and runner-up count, first seen wins ties (as Counter.most_common)
+        count = self.counts[solution]
+        if solution == self.top:
+            self.top_count = count
+        elif count > self.top_count or (count == self.top_count and self.order[solution] < self.order[self.top]):
+            self.second_count = self.top_count
+            self.top, self.top_count = solution, count
+        else:
+            self.second_count = max(self.second_count, count)
+
+        self.lengths[len(solution)] += 1
+        votes = self.positions.get(len(solution))
+        if votes is None:
+            votes = self.positions[len(solution)] = [Counter() for _ in solution]
+        for position, char in enumerate(solution):
+            votes[position][char] += 1
+
+    def leader(self):
+        """Most voted solution and its count (first seen wins ties)"""
+        if not self.counts:
+            return None, 0
+        return self.top, self.top_count
+
+    def lead(self):
+        """Votes between the leader and the runner-up"""
+        return self.top_count - self.second_count
+
+    def is_settled(self, remaining, margin=None):
+        """True once `remaining` readings can no longer change the leader
+
+        With a margin, a lead of that many votes is also accepted as settled.
+        """
+        if not self.counts:
+            return False
+        lead = self.lead()
+        if margin is not None and lead >= margin:
+            return True
+        return lead > remaining
+
+    def character_reading(self):
+        """(text, weakest position's votes) from per-character voting over the most common length"""
+        if not self.lengths:
+            return None, 0
+        length = self.lengths.most_common(1)[0][0]
+        chars, support = [], []
+        for votes in self.positions[length]:
+            char, count = votes.most_common(1)[0]
+            chars.append(char)
+            support.append(count)
+        return ''.join(chars), min(support) if support else 0
+
+    def characters_settled(self, remaining, margin=None):
+        """is_settled for character voting: the length and every position keep their leader"""
+        if not self.lengths:
+            return False
+        leads = [self.vote_lead(self.lengths)]
+        leads.extend(self.vote_lead(votes) for votes in self.positions[self.lengths.most_common(1)[0][0]])
+        lead = min(leads)
+        if margin is not None and lead >= margin:
+            return True
+        return lead > remaining
+
+    @staticmethod
+    def vote_lead(votes):
+        """Votes between the first and second entry of a Counter"""
+        top = votes.most_common(2)
+        return top[0][1] - (top[1][1] if len(top) > 1 else 0)
+
+
+# Structuring elements and filter kernels used by the preprocessing stages
+KERNELS = {
+    'small': lambda: np.ones((1, 1), np.uint8),
+    'medium': lambda: np.ones((2, 2), np.uint8),
+    'horizontal': lambda: cv2.getStructuringElement(cv2.MORPH_RECT, (15, 1)),
+    'vertical': lambda: cv2.getStructuringElement(cv2.MORPH_RECT, (1, 15)),
+    'sharpen': lambda: np.array([[-1, -1, -1], [-1, 9, -1], [-1, -1, -1]]),
+}
+
+
+class PreprocessStage:
+    """Named node of the preprocessing DAG
+
+    func receives the pipeline followed by the outputs of deps and returns
+    the stage output, or None when the stage does not apply to this image.
+    Variant stages are handed to OCR; the others are shared intermediates.
+    batch is an optional function taking N-image stacks instead (True when
+    func itself works on stacks); stages without one run image by image.
+    cost_ms is the stage's measured mean time per image, if known.
+    """
+
+    def __init__(self, name, func, deps=(), variant=True, batch=None, cost_ms=None):
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+        self.variant = variant
+        self.batch = func if batch is True else batch
+        self.cost_ms = cost_ms
+
+
+def build_kernel(definition):
+    """Kernel from a spec definition: {'values': rows} or {'shape': 'ones'|'rect'|'ellipse'|'cross', 'size': [w, h]}"""
+    if 'values' in definition:
+        return np.array(definition['values'])
+    width, height = definition['size']
+    if definition.get('shape', 'ones') == 'ones':
+        return np.ones((height, width), np.uint8)
+    shape = getattr(cv2, 'MORPH_' + definition['shape'].upper())
+    return cv2.getStructuringElement(shape, (width, height))
+
+
+def glyph_boxes(img_array):
+    """(x, y, w, h) boxes of the likely glyphs of an image
+
+    Glyphs are the connected components of the minority class of an Otsu
+    mask, ignoring specks, thin components along the border and frames or
+    lines spanning the whole image.
+    """
+    gray = img_array
+    if gray.ndim == 3:
+        gray = cv2.cvtColor(np.ascontiguousarray(gray[..., :3]), cv2.COLOR_RGB2GRAY)
+    _, mask = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    # Text is the minority class, whatever its polarity
+    if cv2.countNonZero(mask) > mask.size // 2:
+        mask = cv2.bitwise_not(mask)
+    
+    height, width = mask.shape
+    count, _, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+    min_area = max(3, height * width // 2000)
+    boxes = []
+    for x, y, w, h, area in stats[1:count]:
+        if area < min_area:
+            continue
+        touches_border = x == 0 or y == 0 or x + w == width or y + h == height
+        if touches_border and min(w, h) <= 2:
+            continue
+        if w >= 0.9 * width or h >= 0.9 * height:
+            continue
+        boxes.append((int(x), int(y), int(w), int(h)))
+    return boxes
+
+
+def crop_text_region(pipe, img_array):
+    """Crop to the bounding box of the glyphs (only with the crop_text option)
+
+    Returns the image unchanged when no glyph is found or the box covers
+    it anyway.
+    """
+    if not pipe.options.get('crop_text'):
+        return img_array
+    
+    boxes = pipe.boxes_of(img_array)
+    height, width = img_array.shape[:2]
+    if not boxes:
+        return img_array
+    x0, y0 = min(x for x, _, _, _ in boxes), min(y for _, y, _, _ in boxes)
+    x1, y1 = max(x + w for x, _, w, _ in boxes), max(y + h for _, y, _, h in boxes)
+    pad = max(2, (y1 - y0) // 8)
+    x0, y0 = max(0, x0 - pad), max(0, y0 - pad)
+    x1, y1 = min(width, x1 + pad), min(height, y1 + pad)
+    if (x1 - x0) * (y1 - y0) >= 0.9 * width * height:
+        return img_array
+    
+    pipe.info['roi'] = [int(x0), int(y0), int(x1 - x0), int(y1 - y0)]
+    cropped = np.ascontiguousarray(img_array[y0:y1, x0:x1])
+    # The same glyphs, in the cropped image's coordinates
+    pipe.remember_boxes(cropped, [(x - x0, y - y0, w, h) for x, y, w, h in boxes])
+    return cropped
+
+
+def glyph_height(boxes):
+    """Median height in pixels of glyph boxes, None when there are none"""
+    heights = sorted(h for _, _, _, h in boxes if h >= 4)
+    if not heights:
+        return None
+    return heights[len(heights) // 2]
+
+
+def resize_small(min_width=150, min_height=50, min_scale=3, glyph_target=32, max_scale=4):
+    """Stage function choosing the OCR resolution (reported as info['scale'])
+
+    The resolution option picks the policy: 'fixed' upscales images smaller
+    than min_width x min_height by at least min_scale; 'adaptive' uses the
+    smallest integer scale that brings the median glyph height to
+    glyph_target pixels (at most max_scale), falling back to 'fixed' when
+    no glyph is found. The scale option forces a scale.
+    """
+    def stage(pipe, img_array):
+        height, width = img_array.shape[:2]
+        scale_factor = pipe.options.get('scale')
+        if scale_factor is None and pipe.options.get('resolution') == 'adaptive':
+            glyphs = glyph_height(pipe.boxes_of(img_array))
+            if glyphs is not None:
+                pipe.info['glyph_height'] = glyphs
+                scale_factor = min(max_scale, max(1, -(-glyph_target // glyphs)))
+        if scale_factor is None:
+            scale_factor = 1
+            if height < min_height or width < min_width:
+                scale_factor = max(min_scale, min_width // width, min_height // height)
+        pipe.info['scale'] = scale_factor
+        if scale_factor == 1:
+            return img_array
+        out = pipe.buffer((height * scale_factor, width * scale_factor) + img_array.shape[2:], dtype=img_array.dtype)
+        return cv2.resize(img_array, (width * scale_factor, height * scale_factor), dst=out,
+                          interpolation=cv2.INTER_CUBIC)
+    return stage
+
+
+def to_gray(pipe, img_resized):
+    """Grayscale copy of a color image"""
+    if len(img_resized.shape) == 3:
+        return cv2.cvtColor(img_resized, cv2.COLOR_RGB2GRAY, dst=pipe.buffer(img_resized.shape[:2]))
+    return img_resized
+
+
+def invert_dark(level=128):
+    """Stage functions inverting white text on black background (mean below level)"""
+    def stage(pipe, gray):
+        if np.mean(gray) < level:
+            return cv2.bitwise_not(gray, dst=pipe.buffer(gray.shape))
+        return None
+
+    def batch(pipe, gray):
+        # Over an N x H x W stack, None for images that are not dark
+        dark = gray.reshape(len(gray), -1).mean(axis=1) < level
+        inverted = np.empty_like(gray)
+        if dark.any():
+            inverted[dark] = as_rows(cv2.bitwise_not(as_rows(gray[dark]))).reshape(gray[dark].shape)
+        if dark.all():
+            return inverted
+        return [inverted[i] if dark[i] else None for i in range(len(gray))]
+    return stage, batch
+
+
+def as_rows(images):
+    """2-D view of a grayscale image or image stack, for pixel-wise OpenCV calls"""
+    return images.reshape(-1, images.shape[-1])
+
+
+def subtract_lines(pipe, images, lines_mask):
+    """Saturating images - lines_mask, for single images and stacks alike"""
+    out = pipe.buffer(images.shape)
+    rows = cv2.subtract(as_rows(images), as_rows(lines_mask), dst=None if out is None else as_rows(out))
+    return rows.reshape(images.shape)
+
+
+def fixed_thresholds(levels=(120, 140, 160, 180)):
+    """Stage function doing every fixed binarization in one broadcast comparison
+
+    H x W gives len(levels) x H x W; an N x H x W stack gives
+    N x len(levels) x H x W. Matches cv2.threshold(gray, t, 255,
+    THRESH_BINARY) for each t.
+    """
+    def stage(pipe, gray):
+        thresholds = np.array(levels, np.uint8)[:, None, None]
+        out = pipe.buffer(gray.shape[:-2] + (len(levels),) + gray.shape[-2:])
+        if out is None:
+            return (np.expand_dims(gray, -3) > thresholds).view(np.uint8) * np.uint8(255)
+        np.greater(np.expand_dims(gray, -3), thresholds, out=out.view(bool))
+        return np.multiply(out, np.uint8(255), out=out)
+    return stage
+
+
+def pick_threshold(index):
+    """Stage function picking one level out of fixed_thresholds"""
+    return lambda pipe, thresholds: thresholds[..., index, :, :]
+
+
+def otsu(pipe, gray):
+    """Otsu binarization"""
+    return cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU, dst=pipe.buffer(gray.shape))[1]
+
+
+def adaptive_threshold(method='gaussian', block_size=11, c=2):
+    """Stage function for adaptive binarization ('gaussian' or 'mean' neighbourhood)"""
+    adaptive = {'gaussian': 'ADAPTIVE_THRESH_GAUSSIAN_C', 'mean': 'ADAPTIVE_THRESH_MEAN_C'}[method]
+    return lambda pipe, gray: cv2.adaptiveThreshold(gray, 255, getattr(cv2, adaptive), cv2.THRESH_BINARY,
+                                                    block_size, c, dst=pipe.buffer(gray.shape))
+
+
+def median_blur(ksize=3):
+    """Stage function for a median filter"""
+    return lambda pipe, gray: cv2.medianBlur(gray, ksize, dst=pipe.buffer(gray.shape))
+
+
+def bilateral_filter(diameter=9, sigma_color=75, sigma_space=75):
+    """Stage function for a bilateral filter (preserves edges)"""
+    return lambda pipe, gray: cv2.bilateralFilter(gray, diameter, sigma_color, sigma_space,
+                                                  dst=pipe.buffer(gray.shape))
+
+
+def morphology(op, kernel='small', iterations=1):
+    """Stage function for cv2.morphologyEx with op 'open', 'close', 'gradient', 'tophat', ..."""
+    return lambda pipe, gray: cv2.morphologyEx(gray, getattr(cv2, 'MORPH_' + op.upper()), pipe.kernel(kernel),
+                                               dst=pipe.buffer(gray.shape), iterations=iterations)
+
+
+def erode_dilate(kernel='small'):
+    """Stage function for an erosion followed by a dilation"""
+    def stage(pipe, gray):
+        eroded = cv2.erode(gray, pipe.kernel(kernel), dst=pipe.buffer(gray.shape, 'eroded'), iterations=1)
+        return cv2.dilate(eroded, pipe.kernel(kernel), dst=pipe.buffer(gray.shape), iterations=1)
+    return stage
+
+
+def detect_lines(horizontal='horizontal', vertical='vertical'):
+    """Stage function masking horizontal and vertical distraction lines"""
+    def stage(pipe, gray):
+        horizontal_lines = cv2.morphologyEx(gray, cv2.MORPH_OPEN, pipe.kernel(horizontal),
+                                            dst=pipe.buffer(gray.shape, 'horizontal'))
+        vertical_lines = cv2.morphologyEx(gray, cv2.MORPH_OPEN, pipe.kernel(vertical),
+                                          dst=pipe.buffer(gray.shape, 'vertical'))
+        return cv2.add(horizontal_lines, vertical_lines, dst=pipe.buffer(gray.shape))
+    return stage
+
+
+def inpaint_lines(radius=3, dilate='small'):
+    """Stage function using inpainting to "erase" lines"""
+    def stage(pipe, gray, lines_mask):
+        try:
+            # Create more aggressive line mask
+            lines_thick = cv2.dilate(lines_mask, pipe.kernel(dilate), dst=pipe.buffer(gray.shape, 'lines_thick'),
+                                     iterations=1)
+            return cv2.inpaint(gray, lines_thick, radius, cv2.INPAINT_TELEA, dst=pipe.buffer(gray.shape))
+        except Exception:
+            return None
+    return stage
+
+
+def sharpen(kernel='sharpen'):
+    """Stage function convolving with a sharpening kernel"""
+    return lambda pipe, gray: cv2.filter2D(gray, -1, pipe.kernel(kernel), dst=pipe.buffer(gray.shape))
+
+
+def clahe_enhance(clip_limit=2.0, tile=8):
+    """Stage function for CLAHE contrast enhancement"""
+    return lambda pipe, gray: pipe.clahe(clip_limit, tile).apply(gray, dst=pipe.buffer(gray.shape))
+
+
+# Operations a preprocessing spec can use: op -> factory(**params) giving the
+# stage function, or (function, batch function); batch True means the
+# function itself works on N-image stacks
+PREPROCESS_OPERATIONS = {
+    'crop_text': (lambda: crop_text_region, None),
+    'upscale': (resize_small, None),
+    'gray': (lambda: to_gray, None),
+    'invert_dark': (invert_dark, None),
+    'otsu': (lambda: otsu, None),
+    'adaptive_threshold': (adaptive_threshold, None),
+    'fixed_thresholds': (fixed_thresholds, True),
+    'pick_threshold': (pick_threshold, True),
+    'median': (median_blur, None),
+    'bilateral': (bilateral_filter, None),
+    'erode_dilate': (erode_dilate, None),
+    'morphology': (morphology, None),
+    'detect_lines': (detect_lines, None),
+    'subtract': (lambda: subtract_lines, True),
+    'inpaint': (inpaint_lines, None),
+    'sharpen': (sharpen, None),
+    'clahe': (clahe_enhance, None),
+}
+
+
+# Multiple preprocessing techniques improved for CAPTCHAs, in OCR order. Each
+# stage names an operation, its parameters and dependencies; variant False
+# marks shared intermediates and cost_ms is the measured mean time per image
+# (written by --preprocess-export after --bench, None until measured)
+PREPROCESS_SPEC = {
+    'version': 1,
+    'stages': [
+        # Text region crop (optional) and original resized
+        {'name': 'text_region', 'op': 'crop_text', 'deps': ['input'], 'variant': False},
+        {'name': 'Original', 'op': 'upscale', 'deps': ['text_region'],
+         'params': {'min_width': 150, 'min_height': 50, 'min_scale': 3, 'glyph_target': 32, 'max_scale': 4}},
+        {'name': 'Gray', 'op': 'gray', 'deps': ['Original']},
+        # Invert if white text on black background
+        {'name': 'Inverted', 'op': 'invert_dark', 'params': {'level': 128}, 'deps': ['Gray']},
+
+        # Multiple binarizations
+        {'name': 'Otsu', 'op': 'otsu', 'deps': ['Gray']},
+        {'name': 'AdaptiveGauss', 'op': 'adaptive_threshold', 'params': {'method': 'gaussian', 'block_size': 11, 'c': 2},
+         'deps': ['Gray']},
+        {'name': 'AdaptiveMean', 'op': 'adaptive_threshold', 'params': {'method': 'mean', 'block_size': 11, 'c': 2},
+         'deps': ['Gray']},
+        {'name': 'fixed_thresholds', 'op': 'fixed_thresholds', 'params': {'levels': [120, 140, 160, 180]},
+         'deps': ['Gray'], 'variant': False},
+        {'name': 'Thresh120', 'op': 'pick_threshold', 'params': {'index': 0}, 'deps': ['fixed_thresholds']},
+        {'name': 'Thresh140', 'op': 'pick_threshold', 'params': {'index': 1}, 'deps': ['fixed_thresholds']},
+        {'name': 'Thresh160', 'op': 'pick_threshold', 'params': {'index': 2}, 'deps': ['fixed_thresholds']},
+        {'name': 'Thresh180', 'op': 'pick_threshold', 'params': {'index': 3}, 'deps': ['fixed_thresholds']},
+
+        # Noise removal with different kernels
+        {'name': 'Denoised3', 'op': 'median', 'params': {'ksize': 3}, 'deps': ['Gray']},
+        {'name': 'Denoised5', 'op': 'median', 'params': {'ksize': 5}, 'deps': ['Gray']},
+        # Bilateral filter (preserves edges)
+        {'name': 'Bilateral', 'op': 'bilateral', 'params': {'diameter': 9, 'sigma_color': 75, 'sigma_space': 75},
+         'deps': ['Gray']},
+
+        # Multiple morphological operations
+        {'name': 'Morph_Small', 'op': 'erode_dilate', 'params': {'kernel': 'small'}, 'deps': ['Gray']},
+        {'name': 'Morph_Medium', 'op': 'erode_dilate', 'params': {'kernel': 'medium'}, 'deps': ['Gray']},
+        # Opening (removes small noise)
+        {'name': 'Opened', 'op': 'morphology', 'params': {'op': 'open', 'kernel': 'small'}, 'deps': ['Gray']},
+        # Closing (fills holes)
+        {'name': 'Closed', 'op': 'morphology', 'params': {'op': 'close', 'kernel': 'small'}, 'deps': ['Gray']},
+
+        # SPECIAL TECHNIQUES FOR DISTRACTION LINES
+        # 1. Detection of horizontal and vertical lines, removed from the image
+        {'name': 'lines_mask', 'op': 'detect_lines', 'params': {'horizontal': 'horizontal', 'vertical': 'vertical'},
+         'deps': ['Gray'], 'variant': False},
+        {'name': 'NoLines', 'op': 'subtract', 'deps': ['Gray', 'lines_mask']},
+        # 2. Alternative method: use inpainting to "erase" lines
+        {'name': 'Inpainted', 'op': 'inpaint', 'params': {'radius': 3, 'dilate': 'small'}, 'deps': ['Gray', 'lines_mask']},
+        # 3. Aggressive median filter for thin lines
+        {'name': 'MedianStrong', 'op': 'median', 'params': {'ksize': 7}, 'deps': ['Gray']},
+        # 4. Aggressive opening operation to eliminate thin lines
+        {'name': 'OpeningAggressive', 'op': 'morphology', 'params': {'op': 'open', 'kernel': 'medium', 'iterations': 2},
+         'deps': ['Gray']},
+        # 5. Combination: remove lines + binarization
+        {'name': 'NoLinesOtsu', 'op': 'otsu', 'deps': ['NoLines']},
+        # 6. Morphological gradient (highlights edges, reduces lines)
+        {'name': 'Gradient', 'op': 'morphology', 'params': {'op': 'gradient', 'kernel': 'small'}, 'deps': ['Gray']},
+        # 7. Top-hat (highlights small text)
+        {'name': 'TopHat', 'op': 'morphology', 'params': {'op': 'tophat', 'kernel': 'medium'}, 'deps': ['Gray']},
+
+        # Sharpening (enhance edges)
+        {'name': 'Sharpened', 'op': 'sharpen', 'params': {'kernel': 'sharpen'}, 'deps': ['Gray']},
+        # Contrast enhancement
+        {'name': 'Enhanced', 'op': 'clahe', 'params': {'clip_limit': 2.0, 'tile': 8}, 'deps': ['Gray']},
+        # Apply anti-line techniques to enhanced image too
+        {'name': 'EnhancedNoLines', 'op': 'subtract', 'deps': ['Enhanced', 'lines_mask']},
+    ]
+}
+
+
+def compile_preprocess(spec):
+    """Check a preprocessing spec and build its PreprocessStage list once
+
+    Every op must be registered and every dependency declared earlier (or
+    be 'input'), so a bad spec fails here rather than halfway through a
+    solve. Raises ValueError.
+    """
+    stages, known = [], {'input'}
+    for entry in spec['stages']:
+        name = entry['name']
+        if name in known:
+            raise ValueError(f"preprocessing stage '{name}' is declared twice")
+        if entry['op'] not in PREPROCESS_OPERATIONS:
+            raise ValueError(f"preprocessing stage '{name}': unknown op '{entry['op']}'")
+        missing = [dep for dep in entry['deps'] if dep not in known]
+        if missing:
+            raise ValueError(f"preprocessing stage '{name}' depends on undeclared {missing}")
+        factory, batch = PREPROCESS_OPERATIONS[entry['op']]
+        func = factory(**entry.get('params', {}))
+        if isinstance(func, tuple):
+            func, batch = func
+        stages.append(PreprocessStage(name, func, entry['deps'], entry.get('variant', True),
+                                      batch, entry.get('cost_ms')))
+        known.add(name)
+    return stages
+
+
+def load_preprocess_spec(path):
+    """Preprocessing spec from a JSON file (same layout as PREPROCESS_SPEC)"""
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def plan_cost(stages, names=None):
+    """Summed cost_ms of the stages the given variants need (all variants by default), None if unmeasured"""
+    by_name = {stage.name: stage for stage in stages}
+    needed, pending = set(), [stage.name for stage in stages if stage.variant and (names is None or stage.name in names)]
+    while pending:
+        name = pending.pop()
+        if name in by_name and name not in needed:
+            needed.add(name)
+            pending.extend(by_name[name].deps)
+    costs = [by_name[name].cost_ms for name in needed]
+    if any(cost is None for cost in costs):
+        return None
+    return round(sum(costs), 3)
+
+
+PREPROCESS_STAGES = compile_preprocess(PREPROCESS_SPEC)
+
+
+class PreprocessContext:
+    """Per-worker state reused by every PreprocessPipeline of that worker
+
+    Holds the kernels and CLAHE objects, built once, and a pool of stage
+    output buffers keyed by (stage, part, shape, dtype) that OpenCV writes
+    into through dst=. A pipeline's outputs are only valid until the next
+    pipeline sharing the context runs, so one context must not serve
+    overlapping solves. At most max_buffers arrays are kept (least recently
+    used dropped first).
+    """
+
+    def __init__(self, max_buffers=512):
+        self.max_buffers = max_buffers
+        self.buffers = OrderedDict()
+        self.kernels = {}
+        self.clahes = {}
+        self.allocated = 0
+        self.reused = 0
+        self.reused_bytes = 0
+
+    def buffer(self, key, shape, dtype):
+        """Pooled array for key, allocated on first use (contents are stale)"""
+        key = key + (tuple(shape), np.dtype(dtype).str)
+        array = self.buffers.get(key)
+        if array is None:
+            array = self.buffers[key] = np.empty(shape, dtype)
+            self.allocated += 1
+            if len(self.buffers) > self.max_buffers:
+                self.buffers.popitem(last=False)
+        else:
+            self.buffers.move_to_end(key)
+            self.reused += 1
+            self.reused_bytes += array.nbytes
+        return array
+
+    def stats(self):
+        """Buffers allocated and reused so far, and the bytes reuse saved"""
+        return {
+            'buffers': len(self.buffers),
+            'allocated': self.allocated,
+            'reused': self.reused,
+            'reused_mb': round(self.reused_bytes / 2 ** 20, 3)
+        }
+
+
+class PreprocessPipeline:
+    """Lazily evaluates the preprocessing DAG for one image
+
+    Each stage is computed at most once, on first request, and shared by
+    every stage that depends on it. Time spent in each stage's own function
+    is kept in timings (milliseconds). options tune stages (crop_text,
+    resolution, scale); stages report facts about the image in info (roi,
+    scale, glyph_height). With a PreprocessContext, kernels and stage output
+    buffers are reused from earlier pipelines.
+    """
+
+    def __init__(self, img, stages=None, telemetry=None, options=None, context=None):
+        self.stages = {stage.name: stage for stage in (stages or PREPROCESS_STAGES)}
+        # Arrays are used as-is, PIL images are converted once
+        self.values = {'input': np.asarray(img)}
+        self.context = context
+        self.kernels = context.kernels if context is not None else {}
+        self.computing = None
+        self.glyph_source = None
+        self.timings = {}
+        self.telemetry = telemetry
+        self.options = options or {}
+        self.info = {}
+
+    def boxes_of(self, img_array):
+        """glyph_boxes of an image, measured once while that same array flows on (info['glyph_boxes'])"""
+        if self.glyph_source is not img_array:
+            self.remember_boxes(img_array, glyph_boxes(img_array))
+        return self.info['glyph_boxes']
+
+    def remember_boxes(self, img_array, boxes):
+        """Record the glyph boxes of img_array for later stages"""
+        self.glyph_source = img_array
+        self.info['glyph_boxes'] = boxes
+
+    def buffer(self, shape, part='', dtype='uint8'):
+        """Output array for the stage being computed, None without a context (OpenCV then allocates)"""
+        if self.context is None:
+            return None
+        return self.context.buffer((self.computing, part), shape, dtype)
+
+    def clahe(self, clip_limit, tile):
+        """CLAHE object, shared through the context when there is one"""
+        clahes = self.context.clahes if self.context is not None else {}
+        if (clip_limit, tile) not in clahes:
+            clahes[(clip_limit, tile)] = cv2.createCLAHE(clipLimit=clip_limit, tileGridSize=(tile, tile))
+        return clahes[(clip_limit, tile)]
+
+    def kernel(self, name):
+        """Structuring element or filter kernel, built once per pipeline
+
+        name is a KERNELS entry or an inline definition from a
+        preprocessing spec (see build_kernel).
+        """
+        key = name if isinstance(name, str) else json.dumps(name, sort_keys=True)
+        if key not in self.kernels:
+            self.kernels[key] = KERNELS[name]() if isinstance(name, str) else build_kernel(name)
+        return self.kernels[key]
+
+    def variant_names(self):
+        """Names of the variant stages, in OCR order"""
+        return [name for name, stage in self.stages.items() if stage.variant]
+
+    def dependencies(self, name):
+        """Every stage `name` needs, itself included"""
+        needed = {name}
+        for dep in self.stages[name].deps:
+            if dep in self.stages:
+                needed |= self.dependencies(dep)
+        return needed
+
+    def get(self, name):
+        """Output of a stage (None if it does not apply), computed on first use"""
+        if name not in self.values:
+            stage = self.stages[name]
+            inputs = [self.get(dep) for dep in stage.deps]
+            start = time.perf_counter()
+            if any(value is None for value in inputs):
+                self.values[name] = None
+            else:
+                self.computing = name
+                self.values[name] = stage.func(self, *inputs)
+            self.timings[name] = (time.perf_counter() - start) * 1000
+            if self.telemetry is not None:
+                self.telemetry.emit('preprocess_stage', stage=name, ms=self.timings[name],
+                                    applied=self.values[name] is not None)
+        return self.values[name]
+
+    def iter_variants(self, names=None):
+        """Yield (name, array) for every applicable variant, in OCR order
+
+        Only the stages the requested variants need are computed, and each
+        intermediate is released once no later variant depends on it.
+        """
+        order = [name for name in self.variant_names() if names is None or name in names]
+        last_use = {}
+        for index, name in enumerate(order):
+            for node in self.dependencies(name):
+                last_use[node] = index
+
+        for index, name in enumerate(order):
+            value = self.get(name)
+            if value is not None:
+                yield name, value
+            for node, last in last_use.items():
+                if last == index:
+                    self.values.pop(node, None)
+
+
+class BatchPreprocessPipeline(PreprocessPipeline):
+    """Preprocessing DAG over a stack of same-shaped images
+
+    Stage outputs are N-image stacks. Stages with a batch function run once
+    over the whole stack; the others (neighbourhood filters, Otsu, resizing)
+    run image by image and are stacked again. A stage that does not apply
+    to every image yields a list with None for the images it skips.
+    """
+
+    def __init__(self, images, stages=None, telemetry=None, options=None):
+        # Per-image outputs are stacked afterwards, so they cannot share pooled buffers
+        super().__init__(images[0], stages, telemetry, options)
+        self.values = {'input': np.stack([np.asarray(img) for img in images])}
+        self.size = len(images)
+
+    def get(self, name):
+        """Stacked output of a stage, computed on first use"""
+        if name not in self.values:
+            stage = self.stages[name]
+            inputs = [self.get(dep) for dep in stage.deps]
+            start = time.perf_counter()
+            if stage.batch and all(isinstance(value, np.ndarray) for value in inputs):
+                self.values[name] = stage.batch(self, *inputs)
+            else:
+                outputs = []
+                for i in range(self.size):
+                    args = [value[i] for value in inputs]
+                    outputs.append(None if any(arg is None for arg in args) else stage.func(self, *args))
+                if all(output is not None for output in outputs) and \
+                        len(set((output.shape, output.dtype) for output in outputs)) == 1:
+                    outputs = np.stack(outputs)
+                self.values[name] = outputs
+            self.timings[name] = (time.perf_counter() - start) * 1000
+            if self.telemetry is not None:
+                self.telemetry.emit('preprocess_stage', stage=name, ms=self.timings[name], batch=self.size,
+                                    vectorized=isinstance(self.values[name], np.ndarray) and stage.batch is not None)
+        return self.values[name]
+
+
+def build_mosaic(arrays, gutter=None):
+    """Stack variants vertically into one grayscale page for a single OCR call
+
+    Each variant is framed by a gutter of its own background colour (the
+    median of its border pixels) and right-padded to the widest variant.
+    Returns (mosaic, spans) where spans[i] is the (top, bottom) row range
+    of variant i, gutters included.
+    """
+    strips = []
+    for array in arrays:
+        if array.ndim == 3:
+            array = cv2.cvtColor(np.ascontiguousarray(array[..., :3]), cv2.COLOR_RGB2GRAY)
+        strips.append(array)
+    if gutter is None:
+        gutter = max(16, max(strip.shape[0] for strip in strips) // 2)
+    width = max(strip.shape[1] for strip in strips) + 2 * gutter
+
+    blocks, spans, top = [], [], 0
+    for strip in strips:
+        border = np.concatenate([strip[0], strip[-1], strip[:, 0], strip[:, -1]])
+        block = np.full((strip.shape[0] + 2 * gutter, width), int(np.median(border)), dtype=np.uint8)
+        block[gutter:gutter + strip.shape[0], gutter:gutter + strip.shape[1]] = strip
+        blocks.append(block)
+        spans.append((top, top + block.shape[0]))
+        top += block.shape[0]
+    return np.ascontiguousarray(np.vstack(blocks)), spans
+
+
+def parse_tsv_words(tsv):
+    """Recognized words from Tesseract TSV as dicts (text, conf, left, top, width, height, line)"""
+    words = []
+    for row in tsv.splitlines():
+        fields = row.split('\t')
+        if len(fields) < 12 or not fields[0].isdigit() or fields[0] != '5':
+            continue
+        text = fields[11].strip()
+        if not text:
+            continue
+        left, top, width, height = (int(value) for value in fields[6:10])
+        words.append({
+            'text': text,
+            'conf': float(fields[10]),
+            'left': left,
+            'top': top,
+            'width': width,
+            'height': height,
+            'line': tuple(int(value) for value in fields[2:5])
+        })
+    return words
+
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.bmp', '.webp')
+
+
+def iter_labeled_images(directory):
+    """Yield (path, label) for every image in a labeled corpus directory
+
+    Labels come from labels.json ({"file.png": "abc123"}) when present,
+    otherwise from the file name up to the first '_' ("abc123_2.png").
+    """
+    labels = {}
+    labels_file = os.path.join(directory, 'labels.json')
+    if os.path.exists(labels_file):
+        with open(labels_file, 'r') as f:
+            labels = json.load(f)
+
+    for name in sorted(os.listdir(directory)):
+        if not name.lower().endswith(IMAGE_EXTENSIONS):
+            continue
+        if labels:
+            if name not in labels:
+                continue
+            label = labels[name]
+        else:
+            label = os.path.splitext(name)[0].split('_')[0]
+        yield os.path.join(directory, name), label
+
+
+def iter_labeled_samples(corpus):
+    """Yield (name, data, label) for a labeled directory or a synthetic corpus file
+
+    data is the encoded file for directories (see iter_labeled_images) and
+    a decoded uint8 array for .npz corpora (see generate_corpus), which are
+    read in one go instead of one file per image.
+    """
+    if os.path.isfile(corpus):
+        for name, img_array, label, _ in iter_corpus(corpus):
+            yield name, img_array, label
+        return
+    for image_path, label in iter_labeled_images(corpus):
+        with open(image_path, 'rb') as f:
+            yield image_path, f.read(), label
+
+
+# Character sets and conditions of generated corpora
+CORPUS_CHARSETS = {
+    'digits': '0123456789',
+    'lower': 'abcdefghijkmnpqrstuvwxyz',
+    'upper': 'ABCDEFGHJKLMNPQRSTUVWXYZ',
+    'alnum': 'abcdefghijkmnpqrstuvwxyzABCDEFGHJKLMNPQRSTUVWXYZ23456789',
+}
+CORPUS_CONDITIONS = ('lines_h', 'lines_v', 'noise', 'dark', 'lowres')
+
+
+def render_captcha(rng, label, height=50, width=150, conditions=()):
+    """Grayscale CAPTCHA-like image of label with the given conditions applied
+
+    lines_h / lines_v draw distraction lines across the text, noise adds
+    salt-and-pepper pixels, dark renders light text on a dark background
+    and lowres shrinks the result by 2-3x.
+    """
+    background, ink = int(rng.integers(200, 256)), int(rng.integers(0, 80))
+    img = np.full((height, width), background, np.uint8)
+    font = [cv2.FONT_HERSHEY_SIMPLEX, cv2.FONT_HERSHEY_DUPLEX, cv2.FONT_HERSHEY_COMPLEX][rng.integers(3)]
+    thickness = int(rng.integers(1, 3))
+    (text_width, text_height), _ = cv2.getTextSize(label, font, 1.0, thickness)
+    scale = min((width - 12) / text_width, (height - 12) / text_height) * rng.uniform(0.75, 1.0)
+    (text_width, text_height), _ = cv2.getTextSize(label, font, scale, thickness)
+    x = int(rng.integers(4, max(5, width - text_width - 4)))
+    y = int(rng.integers(text_height + 4, max(text_height + 5, height - 4)))
+    cv2.putText(img, label, (x, y), font, scale, ink, thickness, cv2.LINE_AA)
+    
+    if 'lines_h' in conditions:
+        for _ in range(rng.integers(1, 4)):
+            y0, y1 = rng.integers(0, height, 2)
+            cv2.line(img, (0, int(y0)), (width - 1, int(y1)), ink, int(rng.integers(1, 3)))
+    if 'lines_v' in conditions:
+        for _ in range(rng.integers(1, 4)):
+            x0, x1 = rng.integers(0, width, 2)
+            cv2.line(img, (int(x0), 0), (int(x1), height - 1), ink, int(rng.integers(1, 3)))
+    if 'noise' in conditions:
+        specks = rng.random((height, width))
+        amount = rng.uniform(0.02, 0.06)
+        img[specks < amount / 2] = 0
+        img[specks > 1 - amount / 2] = 255
+    if 'dark' in conditions:
+        img = cv2.bitwise_not(img)
+    if 'lowres' in conditions:
+        factor = int(rng.integers(2, 4))
+        img = cv2.resize(img, (width // factor, height // factor), interpolation=cv2.INTER_AREA)
+    return img
+
+
+def generate_corpus(output_path, count=200, seed=0, height=50, width=150, condition_rate=0.35):
+    """Write a seeded, labeled synthetic corpus to a single .npz file
+
+    Each image gets a random character set, 4-6 characters (at least 3
+    distinct) and every condition of CORPUS_CONDITIONS with probability
+    condition_rate. Images are stored padded in one N x height x width
+    array with their real shapes, next to the labels and conditions; the
+    same seed always gives the same file contents.
+    """
+    rng = np.random.default_rng(seed)
+    images = np.zeros((count, height, width), np.uint8)
+    shapes = np.zeros((count, 2), np.int32)
+    labels, conditions = [], []
+    for index in range(count):
+        charset = CORPUS_CHARSETS[sorted(CORPUS_CHARSETS)[rng.integers(len(CORPUS_CHARSETS))]]
+        label = ''
+        while len(set(label)) < 3:
+            label = ''.join(charset[i] for i in rng.integers(len(charset), size=int(rng.integers(4, 7))))
+        applied = [condition for condition in CORPUS_CONDITIONS if rng.random() < condition_rate]
+        img = render_captcha(rng, label, height, width, applied)
+        images[index, :img.shape[0], :img.shape[1]] = img
+        shapes[index] = img.shape
+        labels.append(label)
+        conditions.append(','.join(applied))
+    
+    meta = {'version': 1, 'seed': seed, 'count': count, 'height': height, 'width': width,
+            'condition_rate': condition_rate}
+    with open(output_path, 'wb') as f:
+        np.savez(f, images=images, shapes=shapes, labels=np.array(labels), conditions=np.array(conditions),
+                 meta=np.array(json.dumps(meta)))
+    return meta
+
+
+def iter_corpus(path):
+    """Yield (name, img_array, label, conditions) for every image of a generate_corpus file"""
+    with np.load(path) as corpus:
+        images, shapes = corpus['images'], corpus['shapes']
+        labels, conditions = corpus['labels'], corpus['conditions']
+    for index in range(len(images)):
+        height, width = shapes[index]
+        img_array = np.ascontiguousarray(images[index, :height, :width])
+        yield f'{path}#{index}', img_array, str(labels[index]), str(conditions[index])
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB, None where unsupported"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    if sys.platform == 'darwin':
+        return round(peak / (1024 * 1024), 1)
+    return round(peak / 1024, 1)
+
+
+def print_benchmark(report):
+    """Print the summary of a benchmark report"""
+    latency = report['latency_ms']
+    print(f"📊 {report['images']} images | accuracy {report['accuracy'] * 100:.1f}%")
+    print(f"   Latency ms: p50 {latency['p50']:.1f} | p95 {latency['p95']:.1f} | p99 {latency['p99']:.1f}")
+    print(f"   OCR calls/image: {report['ocr_calls_per_image']:.1f} | peak RSS: {report['peak_rss_mb']} MB")
+    startup = report.get('startup')
+    if startup:
+        print(f"   Startup ms: import {startup['import_ms']:.1f} | construct {startup['construct_ms']:.1f} | "
+              f"first solve {startup['first_solve_ms']:.1f}")
+    pool = report.get('buffer_pool')
+    if pool:
+        print(f"   Buffer pool: {pool['reuse_rate'] * 100:.1f}% of stage outputs reused | "
+              f"{pool['reused_mb_per_image']:.2f} MB/image not allocated | {pool['buffers']} buffers held")
+    for scale, group in report.get('by_scale', {}).items():
+        print(f"   Scale {scale}x: {group['images']} images | accuracy {group['accuracy'] * 100:.1f}% | "
+              f"mean {group['mean_ms']:.1f} ms")
+    stages = list(report['stage_ms_per_image'].items())
+    if stages:
+        print("   Slowest preprocessing stages (ms/image):")
+        for name, ms in stages[:5]:
+            print(f"      {name}: {ms:.2f}")
+
+
+def scale_breakdown(per_image):
+    """Accuracy and mean latency of benchmark entries grouped by the upscaling factor used"""
+    groups = {}
+    for entry in per_image:
+        groups.setdefault(str(entry.get('scale')), []).append(entry)
+    return {
+        scale: {
+            'images': len(entries),
+            'accuracy': sum(entry['correct'] for entry in entries) / len(entries),
+            'mean_ms': round(sum(entry['ms'] for entry in entries) / len(entries), 3)
+        }
+        for scale, entries in sorted(groups.items())
+    }
+
+
+# Metric -> (direction that is worse, relative tolerance)
+BENCHMARK_CHECKS = [
+    ('accuracy', 'lower', 0.0),
+    ('latency_ms.p50', 'higher', 0.10),
+    ('latency_ms.p95', 'higher', 0.10),
+    ('latency_ms.p99', 'higher', 0.15),
+    ('ocr_calls_per_image', 'higher', 0.05),
+    ('peak_rss_mb', 'higher', 0.10),
+    ('startup.import_ms', 'higher', 0.25),
+    ('startup.first_solve_ms', 'higher', 0.15),
+]
+
+
+STARTUP_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import s0lvcaptcha
+imported = time.perf_counter()
+solver = s0lvcaptcha.S0lvCaptcha(s0lvcaptcha.SolverConfig())
+created = time.perf_counter()
+if len(sys.argv) > 1:
+    with open(sys.argv[1], 'rb') as f:
+        solver.solve_bytes(f.read())
+solved = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - start) * 1000,
+    'construct_ms': (created - imported) * 1000,
+    'first_solve_ms': (solved - created) * 1000,
+    'total_ms': (solved - start) * 1000
+}))
+"""
+
+
+def measure_startup(image_path=None):
+    """Import, construction and first-solve latency of a fresh interpreter, in ms"""
+    import subprocess
+    command = [sys.executable, '-c', STARTUP_SCRIPT] + ([image_path] if image_path else [])
+    try:
+        output = subprocess.run(command, cwd=os.path.dirname(os.path.abspath(__file__)),
+                                capture_output=True, text=True, timeout=600).stdout
+        return json.loads(output.strip().splitlines()[-1])
+    except Exception:
+        return None
+
+
+def compare_benchmarks(old_path, new_path):
+    """Compare two benchmark reports and return the metrics that regressed"""
+    with open(old_path, 'r') as f:
+        old = json.load(f)
+    with open(new_path, 'r') as f:
+        new = json.load(f)
+    
+    def metric(report, path):
+        value = report
+        for key in path.split('.'):
+            value = value.get(key) if isinstance(value, dict) else None
+        return value
+    
+    regressions = []
+    print(f"📊 Benchmark comparison: {old_path} -> {new_path}")
+    for path, worse, tolerance in BENCHMARK_CHECKS:
+        before, after = metric(old, path), metric(new, path)
+        if before is None or after is None:
+            continue
+        if worse == 'higher':
+            regressed = after > before * (1 + tolerance)
+        else:
+            regressed = after < before * (1 - tolerance)
+        change = f"{(after - before) / before * 100:+.1f}%" if before else "n/a"
+        mark = '❌' if regressed else '✅'
+        print(f"   {mark} {path}: {before} -> {after} ({change})")
+        if regressed:
+            regressions.append(path)
+    
+    if old.get('images') != new.get('images'):
+        print(f"   ⚠️  Different corpus sizes: {old.get('images')} vs {new.get('images')} images")
+    if regressions:
+        print(f"❌ Regressions: {', '.join(regressions)}")
+    else:
+        print("✅ No regressions")
+    return regressions
+
+
+class Telemetry:
+    """Structured instrumentation events, fanned out to one or more sinks
+
+    A sink is any object with an emit(event) method taking a dict. Solver
+    code only builds events when S0lvCaptcha.telemetry is set, so leaving
+    it as None costs nothing.
+    """
+
+    def __init__(self, *sinks):
+        self.sinks = list(sinks)
+
+    def emit(self, event, **fields):
+        """Send one event: {'event': name, 'ts': unix time, **fields}"""
+        record = {'event': event, 'ts': time.time()}
+        record.update(fields)
+        for sink in self.sinks:
+            sink.emit(record)
+
+
+class JsonLinesSink:
+    """Telemetry sink writing one JSON object per line"""
+
+    def __init__(self, path_or_file):
+        if isinstance(path_or_file, str):
+            self.file = open(path_or_file, 'a')
+            self.owned = True
+        else:
+            self.file = path_or_file
+            self.owned = False
+        self.lock = threading.Lock()
+
+    def emit(self, event):
+        line = json.dumps(event, default=str)
+        with self.lock:
+            self.file.write(line + '\n')
+            self.file.flush()
+
+    def close(self):
+        if self.owned:
+            self.file.close()
+
+
+class TelemetryAggregator:
+    """In-memory telemetry sink with counts and timings per stage, variant and config"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = Counter()
+        self.timings = {}
+
+    def add_timing(self, key, ms):
+        timing = self.timings.setdefault(key, {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+        timing['count'] += 1
+        timing['total_ms'] += ms
+        timing['max_ms'] = max(timing['max_ms'], ms)
+
+    def emit(self, event):
+        kind = event['event']
+        with self.lock:
+            self.counts[kind] += 1
+            if 'ms' not in event:
+                return
+            self.add_timing((kind,), event['ms'])
+            if kind == 'preprocess_stage':
+                self.add_timing(('stage', event['stage']), event['ms'])
+            elif kind == 'ocr_call':
+                self.add_timing(('variant', event['variant']), event['ms'])
+                self.add_timing(('config', event['config']), event['ms'])
+                # True for one reading, the number of None readings for single-pass and mosaic calls
+                if event.get('filtered'):
+                    self.counts['ocr_filtered'] += int(event['filtered'])
+
+    def summary(self):
+        """Nested dict of counts and timings (mean_ms added)"""
+        with self.lock:
+            summary = {'counts': dict(self.counts), 'events': {}, 'stage': {}, 'variant': {}, 'config': {}}
+            for key, timing in self.timings.items():
+                entry = dict(timing, mean_ms=timing['total_ms'] / timing['count'])
+                if len(key) == 1:
+                    summary['events'][key[0]] = entry
+                else:
+                    summary[key[0]][key[1]] = entry
+            return summary
+
+
+class ResultCache:
+    """Content-addressed cache of solve results
+
+    Entries are keyed by a hash of the decoded pixels (plus a scope, so
+    local-only and multi-service results, and results of different solver
+    settings, stay apart) and hold all_results
+    and the consensus output. An in-memory LRU keeps max_entries; with a
+    path, entries are also stored in a sqlite file that survives restarts.
+    With near_duplicates, an exact miss falls back to a cached image whose
+    64-bit difference hash is within max_distance bits.
+    """
+
+    def __init__(self, max_entries=1024, path=None, near_duplicates=False, max_distance=4):
+        self.max_entries = max_entries
+        self.near_duplicates = near_duplicates
+        self.max_distance = max_distance
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.near_hits = 0
+        self.disk_hits = 0
+        self.db = None
+        if path:
+            import sqlite3
+            # Batch workers in other processes may share the file
+            self.db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+            self.db.execute('CREATE TABLE IF NOT EXISTS results '
+                            '(key TEXT PRIMARY KEY, scope TEXT, phash TEXT, value TEXT)')
+            self.db.commit()
+
+    @staticmethod
+    def pixel_key(img_array, scope=''):
+        """Hash of the decoded pixels, shape and dtype"""
+        digest = hashlib.blake2b(np.ascontiguousarray(img_array), digest_size=20)
+        digest.update(f'{img_array.dtype}{img_array.shape}{scope}'.encode())
+        return digest.hexdigest()
+
+    @staticmethod
+    def difference_hash(img_array):
+        """64-bit perceptual difference hash (dHash) of an image"""
+        gray = img_array
+        if gray.ndim == 3:
+            gray = cv2.cvtColor(np.ascontiguousarray(gray[..., :3]), cv2.COLOR_RGB2GRAY)
+        small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+        bits = np.packbits(small[:, 1:] > small[:, :-1])
+        return int.from_bytes(bits.tobytes(), 'big')
+
+    def remember(self, key, scope, phash, value):
+        """Insert into the LRU, evicting the least recently used entry"""
+        self.entries[key] = (scope, phash, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def nearest(self, scope, phash):
+        """Closest cached value within max_distance bits, None if there is none
+
+        Only hashes are compared; the value of the closest entry alone is
+        read (and decoded, for disk entries that are then kept in the LRU).
+        """
+        candidates = [(key, entry_phash) for key, (entry_scope, entry_phash, _) in self.entries.items()
+                      if entry_scope == scope]
+        if self.db is not None:
+            rows = self.db.execute('SELECT key, phash FROM results WHERE scope = ?', (scope,)).fetchall()
+            candidates.extend((key, int(row_phash, 16)) for key, row_phash in rows)
+        best_distance, best_key, best_phash = self.max_distance + 1, None, None
+        for key, entry_phash in candidates:
+            distance = bin(entry_phash ^ phash).count('1')
+            if distance < best_distance:
+                best_distance, best_key, best_phash = distance, key, entry_phash
+        if best_key is None:
+            return None
+        if best_key in self.entries:
+            self.entries.move_to_end(best_key)
+            return self.entries[best_key][2]
+        row = self.db.execute('SELECT value FROM results WHERE key = ?', (best_key,)).fetchone()
+        value = json.loads(row[0])
+        self.remember(best_key, scope, best_phash, value)
+        return value
+
+    def get(self, img_array, scope=''):
+        """Cached (all_results, best_solution, confidence, sources) or None"""
+        key = self.pixel_key(img_array, scope)
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.unpack(self.entries[key][2])
+            
+            if self.db is not None:
+                row = self.db.execute('SELECT phash, value FROM results WHERE key = ?', (key,)).fetchone()
+                if row:
+                    value = json.loads(row[1])
+                    self.remember(key, scope, int(row[0], 16), value)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return self.unpack(value)
+            
+            if self.near_duplicates:
+                value = self.nearest(scope, self.difference_hash(img_array))
+                if value is not None:
+                    self.hits += 1
+                    self.near_hits += 1
+                    return self.unpack(value)
+            
+            self.misses += 1
+            return None
+
+    def put(self, img_array, result, scope=''):
+        """Store the (all_results, best_solution, confidence, sources) of a solve"""
+        all_results, best_solution, confidence, sources = result
+        value = {
+            'all_results': [list(entry) for entry in all_results],
+            'best_solution': best_solution,
+            'confidence': confidence,
+            'sources': list(sources)
+        }
+        key = self.pixel_key(img_array, scope)
+        phash = self.difference_hash(img_array)
+        with self.lock:
+            self.remember(key, scope, phash, value)
+            if self.db is not None:
+                self.db.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)',
+                                (key, scope, format(phash, '016x'), json.dumps(value)))
+                self.db.commit()
+
+    @staticmethod
+    def unpack(value):
+        return ([tuple(entry) for entry in value['all_results']], value['best_solution'],
+                value['confidence'], list(value['sources']))
+
+    def stats(self):
+        """Hit/miss counters"""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'near_hits': self.near_hits,
+                'disk_hits': self.disk_hits,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'entries': len(self.entries)
+            }
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+
+
+class GlyphClassifier:
+    """Nearest-neighbour character reader for fixed-style CAPTCHAs
+
+    Characters are segmented from the NoLinesOtsu (or Otsu) variant by
+    connected components, split at column projection minima when they
+    touch, scaled to SIZE and matched against every training glyph in one
+    vectorized distance computation. Models are .npz files.
+    """
+
+    # Normalized glyph width, height
+    SIZE = (16, 20)
+
+    def __init__(self, features=None, labels=None, lengths=()):
+        width, height = self.SIZE
+        self.features = np.zeros((0, width * height), np.float32) if features is None else np.asarray(features, np.float32)
+        self.labels = np.array([] if labels is None else labels, dtype=str)
+        self.lengths = set(int(length) for length in lengths)
+        self.norms = (self.features ** 2).sum(axis=1)
+        self.trained = {}
+
+    @classmethod
+    def segmentations(cls, img_array, options=None, count=None, lengths=()):
+        """(mask, boxes) for the NoLinesOtsu and Otsu variants, best first
+
+        Masks are foreground-white with thin lines and specks opened away.
+        The best segmentation has a character count closest to count (or to
+        one of lengths), then the most glyph pixels.
+        """
+        pipeline = PreprocessPipeline(img_array, options=options)
+        targets = [count] if count is not None else list(lengths)
+        found = []
+        for name in ('NoLinesOtsu', 'Otsu'):
+            mask = pipeline.get(name)
+            if mask is None:
+                continue
+            # Glyphs are the minority class, whatever their polarity
+            if cv2.countNonZero(mask) > mask.size // 2:
+                mask = cv2.bitwise_not(mask)
+            mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, pipeline.kernel('medium'))
+            boxes = cls.segment(mask, count)
+            if boxes:
+                mismatch = min((abs(len(boxes) - target) for target in targets), default=0)
+                found.append((mismatch, -cv2.countNonZero(mask), mask, boxes))
+        found.sort(key=lambda candidate: candidate[:2])
+        return [(mask, boxes) for _, _, mask, boxes in found]
+
+    @staticmethod
+    def segment(mask, count=None):
+        """Glyph boxes (x0, x1) left to right, split or trimmed to count boxes when given"""
+        height, width = mask.shape
+        n, _, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+        min_area = max(4, height * width // 4000)
+        boxes = sorted([x, x + w] for x, y, w, h, area in stats[1:n]
+                       if area >= min_area and w < width // 2)
+
+        # Pieces of one character (dots of i and j, broken strokes) overlap horizontally
+        merged = []
+        for box in boxes:
+            if merged and min(merged[-1][1], box[1]) - max(merged[-1][0], box[0]) >= \
+                    0.5 * min(merged[-1][1] - merged[-1][0], box[1] - box[0]):
+                merged[-1][1] = max(merged[-1][1], box[1])
+            else:
+                merged.append(box)
+        boxes = merged
+
+        # Touching characters: split the widest box at its emptiest column
+        columns = (mask > 0).sum(axis=0)
+        while boxes:
+            widths = [x1 - x0 for x0, x1 in boxes]
+            widest = int(np.argmax(widths))
+            if count is not None:
+                if len(boxes) >= count:
+                    break
+            elif len(boxes) < 3 or widths[widest] < 1.6 * np.median(widths):
+                break
+            x0, x1 = boxes[widest]
+            if x1 - x0 < 4:
+                break
+            lo, hi = x0 + (x1 - x0) // 4, x1 - (x1 - x0) // 4
+            cut = lo + int(np.argmin(columns[lo:hi]))
+            boxes[widest:widest + 1] = [[x0, cut], [cut, x1]]
+
+        # Leftover line fragments: drop the boxes with the fewest glyph pixels
+        while count is not None and len(boxes) > count:
+            del boxes[int(np.argmin([columns[x0:x1].sum() for x0, x1 in boxes]))]
+        return [tuple(box) for box in boxes]
+
+    @classmethod
+    def glyph_features(cls, mask, boxes):
+        """G x D matrix of normalized glyphs, one row per box"""
+        features = []
+        for x0, x1 in boxes:
+            column = mask[:, x0:x1]
+            rows = np.flatnonzero(column.any(axis=1))
+            if len(rows):
+                column = column[rows[0]:rows[-1] + 1]
+            glyph = cv2.resize(column, cls.SIZE, interpolation=cv2.INTER_AREA)
+            features.append(glyph.reshape(-1).astype(np.float32) / 255.0)
+        width, height = cls.SIZE
+        return np.array(features, np.float32).reshape(-1, width * height)
+
+    def read(self, img_array, options=None):
+        """(text, confidence 0-100) for an image, (None, 0.0) when nothing matches"""
+        if not len(self.labels):
+            return None, 0.0
+        # Fixed-length models segment to that length, others prefer lengths seen in training
+        count = next(iter(self.lengths)) if len(self.lengths) == 1 else None
+        candidates = self.segmentations(img_array, options, count, self.lengths)
+        if not candidates:
+            return None, 0.0
+        mask, boxes = candidates[0]
+
+        glyphs = self.glyph_features(mask, boxes)
+        distances = (glyphs ** 2).sum(axis=1)[:, None] + self.norms[None, :] - 2.0 * glyphs @ self.features.T
+        best = distances.argmin(axis=1)
+        chars = self.labels[best]
+        nearest = distances[np.arange(len(best)), best]
+        # Margin to the closest glyph of any other character
+        other = np.where(self.labels[None, :] != chars[:, None], distances, np.inf).min(axis=1)
+        confidence = np.where(np.isfinite(other) & (other > 0), 1.0 - nearest / np.maximum(other, 1e-9), 1.0)
+        return ''.join(chars), round(float(np.clip(confidence, 0.0, 1.0).mean()) * 100, 1)
+
+    @classmethod
+    def train(cls, samples, options=None):
+        """Build a model from (img_array, label) pairs
+
+        Images whose segmentation does not give one box per label character
+        are skipped; counts are kept in trained.
+        """
+        features, labels, lengths = [], [], set()
+        used = skipped = 0
+        for img_array, label in samples:
+            candidates = cls.segmentations(img_array, options, count=len(label))
+            if not candidates or len(candidates[0][1]) != len(label):
+                skipped += 1
+                continue
+            mask, boxes = candidates[0]
+            features.append(cls.glyph_features(mask, boxes))
+            labels.extend(label)
+            lengths.add(len(label))
+            used += 1
+        width, height = cls.SIZE
+        model = cls(np.concatenate(features) if features else np.zeros((0, width * height), np.float32),
+                    labels, lengths)
+        model.trained = {'images': used, 'skipped': skipped, 'glyphs': len(labels)}
+        return model
+
+    def save(self, path):
+        """Write the model as a compressed .npz"""
+        np.savez_compressed(path, features=self.features.astype(np.float16), labels=self.labels,
+                            lengths=np.array(sorted(self.lengths), np.int16), size=np.array(self.SIZE, np.int16))
+
+    @classmethod
+    def load(cls, path):
+        """Model saved by save()"""
+        with np.load(path) as data:
+            if tuple(data['size']) != cls.SIZE:
+                raise ValueError(f"{path}: glyph size {tuple(data['size'])} does not match {cls.SIZE}")
+            return cls(data['features'], data['labels'], data['lengths'])
+
+
+class SolverConfig:
+    """Explicit solver settings for library use
+
+    S0lvCaptcha(SolverConfig(...)) prints nothing, never prompts and never
+    reads or writes s0lvcaptcha_config.json. services maps '2captcha',
+    'anticaptcha' and 'capmonster' to API keys; grid_profile is a path or
+    an already loaded profile; cache is a ResultCache; glyph_model is a
+    GlyphClassifier or the path of a saved one; consensus is 'exact' or
+    'characters' (per-position voting over OCR readings); resolution is
+    'fixed' or 'adaptive' (upscale by measured glyph height) and scale
+    forces an upscaling factor; preprocess is a
+    preprocessing spec (see PREPROCESS_SPEC) or the path of a JSON one;
+    buffer_pool reuses preprocessing buffers across solves (one solve at a
+    time per solver, see PreprocessContext).
+    """
+
+    def __init__(self, services=None, workers=1, dedup=True, early_exit=False, early_exit_margin=None,
+                 deadline_ms=None, grid_profile=None, top_k=None, telemetry=None, lang='eng',
+                 tessdata_path=None, cache=None, crop_text=False, resolution='fixed', scale=None, mosaic=False,
+                 single_pass=False, glyph_model=None, glyph_threshold=None,
+                 consensus='exact', preprocess=None, buffer_pool=False, quiet=True):
+        self.services = dict(services or {})
+        self.workers = workers
+        self.dedup = dedup
+        self.early_exit = early_exit
+        self.early_exit_margin = early_exit_margin
+        self.deadline_ms = deadline_ms
+        self.grid_profile = grid_profile
+        self.top_k = top_k
+        self.telemetry = telemetry
+        self.lang = lang
+        self.tessdata_path = tessdata_path
+        self.cache = cache
+        self.crop_text = crop_text
+        self.resolution = resolution
+        # Same rule as the CLI's positive_int: resize_small needs a whole factor
+        if scale is not None and (isinstance(scale, bool) or not isinstance(scale, int) or scale < 1):
+            raise ValueError(f"scale must be an integer of at least 1, got {scale!r}")
+        self.scale = scale
+        self.mosaic = mosaic
+        self.single_pass = single_pass
+        self.glyph_model = glyph_model
+        self.glyph_threshold = glyph_threshold
+        self.consensus = consensus
+        self.preprocess = preprocess
+        self.buffer_pool = buffer_pool
+        self.quiet = quiet
+
+
+class S0lvCaptcha:
+    EXTERNAL_SOURCES = ('2captcha', 'AntiCaptcha', 'CapMonster')
+    
+    OCR_CONFIGS = [
+        # Basic configurations
+        '--psm 8 --oem 3',
+        '--psm 7 --oem 3', 
+        '--psm 6 --oem 3',
+        '--psm 13',
+        
+        # Alphanumeric only (common in CAPTCHAs)
+        '--psm 8 -c tessedit_char_whitelist=ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789',
+        '--psm 7 -c tessedit_char_whitelist=ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789',
+        '--psm 6 -c tessedit_char_whitelist=ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789',
+        
+        # Uppercase and numbers only (common)
+        '--psm 8 -c tessedit_char_whitelist=ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789',
+        '--psm 7 -c tessedit_char_whitelist=ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789',
+        
+        # Lowercase and numbers only (for cases like "bxawf8")
+        '--psm 8 -c tessedit_char_whitelist=abcdefghijklmnopqrstuvwxyz0123456789',
+        '--psm 7 -c tessedit_char_whitelist=abcdefghijklmnopqrstuvwxyz0123456789',
+        '--psm 6 -c tessedit_char_whitelist=abcdefghijklmnopqrstuvwxyz0123456789',
+        
+        # Special configurations for difficult CAPTCHAs
+        '--psm 8 --oem 1',
+        '--psm 7 --oem 1',
+        '--psm 8 --oem 2',
+        '--psm 10 --oem 3',
+        
+        # With additional configurations
+        '--psm 8 -c tessedit_char_whitelist=abcdefghijklmnopqrstuvwxyz0123456789 -c load_system_dawg=0 -c load_freq_dawg=0',
+        '--psm 7 -c tessedit_char_whitelist=abcdefghijklmnopqrstuvwxyz0123456789 -c load_system_dawg=0 -c load_freq_dawg=0'
+    ]
+    
+    def __init__(self, config=None):
+        """Interactive setup by default; library mode when a SolverConfig is given"""
         self.services = {}
         self.config_file = 's0lvcaptcha_config.json'
+        self.quiet = False
+        self.ocr_engine = TesseractEngine()
+        self.executors = {}
+        self.executor_lock = threading.Lock()
+        self.ocr_workers = 1
+        self.ocr_dedup = True
+        self.ocr_early_exit = False
+        self.ocr_early_exit_margin = None
+        self.ocr_deadline_ms = None
+        self.ocr_crop_text = False
+        self.ocr_resolution = 'fixed'
+        self.ocr_scale = None
+        self.ocr_mosaic = False
+        self.ocr_single_pass = False
+        self.glyph_model = None
+        self.glyph_threshold = None
+        self.consensus_mode = 'exact'
+        self.preprocess_spec = PREPROCESS_SPEC
+        self.preprocess_stages = PREPROCESS_STAGES
+        self.preprocess_context = None
+        self.glyph_digest = None
+        self.grid_profile = None
+        self.grid_top_k = None
+        self.telemetry = None
+        self.result_cache = None
+        self.last_ocr_stats = {}
+        
+        if config is not None:
+            self.apply_config(config)
+            return
+        
         self.show_banner()
         self.load_saved_config()
     
+    def apply_config(self, config):
+        """Apply a SolverConfig"""
+        self.services = dict(config.services)
+        self.quiet = config.quiet
+        # The old engine's handles would otherwise stay loaded until exit
+        self.ocr_engine.close()
+        self.ocr_engine = TesseractEngine(config.lang, config.tessdata_path)
+        self.ocr_workers = max(1, config.workers)
+        self.ocr_dedup = config.dedup
+        self.ocr_early_exit = config.early_exit or config.early_exit_margin is not None
+        self.ocr_early_exit_margin = config.early_exit_margin
+        self.ocr_deadline_ms = config.deadline_ms
+        self.ocr_crop_text = config.crop_text
+        self.ocr_resolution = config.resolution
+        self.ocr_scale = config.scale
+        self.ocr_mosaic = config.mosaic
+        self.ocr_single_pass = config.single_pass
+        if isinstance(config.glyph_model, str):
+            self.glyph_model = GlyphClassifier.load(config.glyph_model)
+        else:
+            self.glyph_model = config.glyph_model
+        self.glyph_threshold = config.glyph_threshold
+        self.consensus_mode = config.consensus
+        if config.preprocess is not None:
+            # Compiled once here, every pipeline reuses the stage list
+            spec = load_preprocess_spec(config.preprocess) if isinstance(config.preprocess, str) else config.preprocess
+            self.preprocess_stages = compile_preprocess(spec)
+            self.preprocess_spec = spec
+        self.preprocess_context = PreprocessContext() if config.buffer_pool else None
+        self.telemetry = config.telemetry
+        self.result_cache = config.cache
+        if isinstance(config.grid_profile, str):
+            self.load_grid_profile(config.grid_profile, config.top_k)
+        else:
+            self.grid_profile = config.grid_profile
+            self.grid_top_k = config.top_k
+    
+    def log(self, *args, **kwargs):
+        """Console progress output, silent in quiet mode"""
+        if not self.quiet:
+            print(*args, **kwargs)
+    
     def show_banner(self):
         """Display s0lvcaptcha banner"""
         banner = f"""
@@ -252,153 +2071,380 @@ class S0lvCaptcha:
         except Exception as e:
             print(f"❌ Error during reset: {e}")
     
+    def preprocess_options(self):
+        """Options handed to every preprocessing pipeline"""
+        return {'crop_text': self.ocr_crop_text, 'resolution': self.ocr_resolution, 'scale': self.ocr_scale}
+    
     def preprocess_multiple(self, img):
         """Multiple preprocessing techniques improved for CAPTCHAs"""
-        img_array = np.array(img)
-        processed_images = []
-        
-        # Resize if too small
-        height, width = img_array.shape[:2] if len(img_array.shape) == 3 else img_array.shape
-        if height < 50 or width < 150:
-            scale_factor = max(3, 150 // width, 50 // height)
-            new_height = height * scale_factor
-            new_width = width * scale_factor
-            img_resized = cv2.resize(img_array, (new_width, new_height), interpolation=cv2.INTER_CUBIC)
-        else:
-            img_resized = img_array
-        
-        # Original resized
-        processed_images.append(('Original', Image.fromarray(img_resized)))
-        
-        # Grayscale
-        if len(img_resized.shape) == 3:
-            gray = cv2.cvtColor(img_resized, cv2.COLOR_RGB2GRAY)
-        else:
-            gray = img_resized
-        processed_images.append(('Gray', Image.fromarray(gray)))
-        
-        # Invert if white text on black background
-        if np.mean(gray) < 128:
-            inverted = cv2.bitwise_not(gray)
-            processed_images.append(('Inverted', Image.fromarray(inverted)))
-        
-        # Multiple binarizations
-        # Otsu
-        _, otsu = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-        processed_images.append(('Otsu', Image.fromarray(otsu)))
-        
-        # Adaptive binarization - Gaussian
-        binary_gauss = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2)
-        processed_images.append(('AdaptiveGauss', Image.fromarray(binary_gauss)))
-        
-        # Adaptive binarization - Mean
-        binary_mean = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY, 11, 2)
-        processed_images.append(('AdaptiveMean', Image.fromarray(binary_mean)))
-        
-        # Multiple fixed thresholds
-        for thresh_val in [120, 140, 160, 180]:
-            _, thresh_fixed = cv2.threshold(gray, thresh_val, 255, cv2.THRESH_BINARY)
-            processed_images.append((f'Thresh{thresh_val}', Image.fromarray(thresh_fixed)))
-        
-        # Noise removal with different kernels
-        denoised3 = cv2.medianBlur(gray, 3)
-        processed_images.append(('Denoised3', Image.fromarray(denoised3)))
-        
-        denoised5 = cv2.medianBlur(gray, 5)
-        processed_images.append(('Denoised5', Image.fromarray(denoised5)))
-        
-        # Bilateral filter (preserves edges)
-        bilateral = cv2.bilateralFilter(gray, 9, 75, 75)
-        processed_images.append(('Bilateral', Image.fromarray(bilateral)))
-        
-        # Multiple morphological operations
-        kernel_small = np.ones((1,1), np.uint8)
-        kernel_medium = np.ones((2,2), np.uint8)
-        kernel_large = np.ones((3,3), np.uint8)
-        
-        # Erosion and dilation
-        eroded_small = cv2.erode(gray, kernel_small, iterations=1)
-        dilated_small = cv2.dilate(eroded_small, kernel_small, iterations=1)
-        processed_images.append(('Morph_Small', Image.fromarray(dilated_small)))
-        
-        eroded_medium = cv2.erode(gray, kernel_medium, iterations=1)
-        dilated_medium = cv2.dilate(eroded_medium, kernel_medium, iterations=1)
-        processed_images.append(('Morph_Medium', Image.fromarray(dilated_medium)))
-        
-        # Opening (removes small noise)
-        opened = cv2.morphologyEx(gray, cv2.MORPH_OPEN, kernel_small)
-        processed_images.append(('Opened', Image.fromarray(opened)))
-        
-        # Closing (fills holes)
-        closed = cv2.morphologyEx(gray, cv2.MORPH_CLOSE, kernel_small)
-        processed_images.append(('Closed', Image.fromarray(closed)))
-        
-        # SPECIAL TECHNIQUES FOR DISTRACTION LINES
-        
-        # 1. Detection of horizontal and vertical lines
-        horizontal_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (15, 1))
-        vertical_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (1, 15))
-        
-        # Detect horizontal lines
-        horizontal_lines = cv2.morphologyEx(gray, cv2.MORPH_OPEN, horizontal_kernel)
-        # Detect vertical lines  
-        vertical_lines = cv2.morphologyEx(gray, cv2.MORPH_OPEN, vertical_kernel)
-        
-        # Combine detected lines
-        lines_mask = cv2.add(horizontal_lines, vertical_lines)
-        
-        # Remove lines from original image
-        no_lines = cv2.subtract(gray, lines_mask)
-        processed_images.append(('NoLines', Image.fromarray(no_lines)))
-        
-        # 2. Alternative method: use inpainting to "erase" lines
+        pipeline = PreprocessPipeline(img, self.preprocess_stages, options=self.preprocess_options())
+        return [(name, Image.fromarray(array)) for name, array in pipeline.iter_variants()]
+    
+    def preprocess_batch(self, images):
+        """Preprocess many images at once (e.g. a directory of same-sized CAPTCHAs)
+        
+        Images of the same shape are stacked and run through one
+        BatchPreprocessPipeline. Returns, for each input image in order, the
+        (name, array) variants preprocess_multiple would give as images.
+        """
+        arrays = [np.asarray(img) for img in images]
+        groups = {}
+        for index, array in enumerate(arrays):
+            groups.setdefault((array.shape, array.dtype.str), []).append(index)
+        
+        processed = [[] for _ in arrays]
+        for indices in groups.values():
+            pipeline = BatchPreprocessPipeline([arrays[i] for i in indices], self.preprocess_stages,
+                                               telemetry=self.telemetry, options=self.preprocess_options())
+            for name, values in pipeline.iter_variants():
+                for index, value in zip(indices, values):
+                    if value is not None:
+                        processed[index].append((name, value))
+        return processed
+    
+    def filter_ocr_result(self, result):
+        """Clean an OCR reading, None if it looks like line noise"""
+        # Filter results more strictly for CAPTCHAs with lines
+        if result and len(result) >= 3 and len(result) <= 12:
+            # Clean result
+            cleaned = ''.join(c for c in result if c.isalnum())
+            
+            # Additional filters to discard OCR confused by lines
+            if (len(cleaned) >= 3 and 
+                not cleaned.lower() in ['bets', 'bests', 'pets', 'pats', 'ets', 'ests', 'sees', 'sess', 'pss', 'ess'] and
+                not all(c in 'se' for c in cleaned.lower()) and  # Avoid only 's' and 'e'
+                not cleaned.lower().startswith('dav') and  # Avoid "Davessi" etc
+                len(set(cleaned.lower())) > 2):  # Must have at least 3 different chars
+                
+                return cleaned
+        return None
+    
+    def ocr_call(self, prep_img, config, prep_name=None):
+        """Run one OCR call and return the filtered reading"""
+        telemetry = self.telemetry
+        if telemetry is not None:
+            start = time.perf_counter()
         try:
-            # Create more aggressive line mask
-            lines_thick = cv2.dilate(lines_mask, kernel_small, iterations=1)
-            inpainted = cv2.inpaint(gray, lines_thick, 3, cv2.INPAINT_TELEA)
-            processed_images.append(('Inpainted', Image.fromarray(inpainted)))
-        except:
-            pass
-        
-        # 3. Aggressive median filter for thin lines
-        median_strong = cv2.medianBlur(gray, 7)
-        processed_images.append(('MedianStrong', Image.fromarray(median_strong)))
-        
-        # 4. Aggressive opening operation to eliminate thin lines
-        opening_aggressive = cv2.morphologyEx(gray, cv2.MORPH_OPEN, kernel_medium, iterations=2)
-        processed_images.append(('OpeningAggressive', Image.fromarray(opening_aggressive)))
-        
-        # 5. Combination: remove lines + binarization
-        no_lines_otsu = cv2.threshold(no_lines, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
-        processed_images.append(('NoLinesOtsu', Image.fromarray(no_lines_otsu)))
-        
-        # 6. Morphological gradient (highlights edges, reduces lines)
-        gradient = cv2.morphologyEx(gray, cv2.MORPH_GRADIENT, kernel_small)
-        processed_images.append(('Gradient', Image.fromarray(gradient)))
+            result = self.ocr_engine.image_to_string(prep_img, config=config).strip()
+        except Exception as e:
+            if telemetry is not None:
+                telemetry.emit('ocr_call', variant=prep_name, config=config, ms=(time.perf_counter() - start) * 1000,
+                               raw=None, result=None, filtered=True, error=str(e))
+            return None
+        cleaned = self.filter_ocr_result(result)
+        if telemetry is not None:
+            telemetry.emit('ocr_call', variant=prep_name, config=config, ms=(time.perf_counter() - start) * 1000,
+                           raw=result, result=cleaned, filtered=cleaned is None)
+        return cleaned
+    
+    @staticmethod
+    def image_digest(array):
+        """Content hash of a preprocessed array, equal for byte-identical buffers"""
+        digest = hashlib.blake2b(np.ascontiguousarray(array), digest_size=16)
+        digest.update(f'{array.dtype}{array.shape}'.encode())
+        return digest.hexdigest()
+    
+    def ocr_executor(self, workers):
+        """The solver's OCR thread pool of that size, created on first use and kept until close()
+        
+        Its threads live as long as the solver, so the Tesseract handles
+        they check out stay loaded instead of being rebuilt per solve.
+        """
+        with self.executor_lock:
+            if workers not in self.executors:
+                from concurrent.futures import ThreadPoolExecutor
+                self.executors[workers] = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='s0lvcaptcha-ocr')
+            return self.executors[workers]
+    
+    def close(self):
+        """Release the OCR thread pools and the native Tesseract handles"""
+        with self.executor_lock:
+            for executor in self.executors.values():
+                executor.shutdown(wait=True)
+            self.executors = {}
+        self.ocr_engine.close()
+    
+    def iter_ocr_grid(self, tasks, workers=1, stats=None, call=None):
+        """Yield (task, reading) in task order for (prep_name, prep_img, config, digest) tasks
+        
+        Tasks sharing a digest and config reuse the first call's reading
+        instead of running OCR again (digest None disables this). With more
+        than one worker, up to two calls per worker are kept in flight on the
+        solver's thread pool; results are still yielded in submission order.
+        Closing the generator cancels calls that have not started and waits
+        for the running ones. OCR calls made
+        are counted in stats['calls']. call(prep_img, config, prep_name)
+        replaces ocr_call.
+        """
+        seen = {}
+        call = call or self.ocr_call
+        if stats is None:
+            stats = {}
+        stats.setdefault('calls', 0)
+        if workers <= 1:
+            for task in tasks:
+                key = (task[3], task[2])
+                if task[3] is None or key not in seen:
+                    seen[key] = call(task[1], task[2], task[0])
+                    stats['calls'] += 1
+                yield task, seen[key]
+            return
         
-        # 7. Top-hat (highlights small text)
-        tophat = cv2.morphologyEx(gray, cv2.MORPH_TOPHAT, kernel_medium)
-        processed_images.append(('TopHat', Image.fromarray(tophat)))
+        from concurrent.futures import wait
+        executor = self.ocr_executor(workers)
+        pending = deque()
+        try:
+            for task in tasks:
+                key = (task[3], task[2])
+                future = seen.get(key) if task[3] is not None else None
+                if future is None:
+                    future = seen[key] = executor.submit(call, task[1], task[2], task[0])
+                    stats['calls'] += 1
+                pending.append((task, future))
+                if len(pending) >= workers * 2:
+                    done_task, future = pending.popleft()
+                    yield done_task, future.result()
+            while pending:
+                done_task, future = pending.popleft()
+                yield done_task, future.result()
+        finally:
+            for future in set(future for _, future in pending):
+                if future.cancel():
+                    stats['calls'] -= 1
+            # Callers may reuse the images (pooled buffers) once the grid is closed
+            wait([future for _, future in pending])
+    
+    def iter_ocr_tasks(self, pipeline, configs, pairs=None, stats=None):
+        """Yield (prep_name, prep_img, config, digest) tasks, preprocessing on demand
+        
+        Without pairs every variant is crossed with every config, in order;
+        otherwise only the given (prep_name, config) pairs are produced.
+        Variants and distinct digests seen are counted in stats.
+        """
+        if stats is None:
+            stats = {}
+        digests = set()
+        prepared = {}
+        
+        def prepare(prep_name, array):
+            # Arrays go straight to the OCR engine, no PIL conversion per variant
+            prep_img = np.ascontiguousarray(array)
+            # Byte-identical variants (1x1 kernels, thresholds matching Otsu) are OCR'd once
+            digest = self.image_digest(prep_img) if self.ocr_dedup else None
+            digests.add(digest if self.ocr_dedup else prep_name)
+            stats['variants'] = stats.get('variants', 0) + 1
+            stats['unique'] = len(digests)
+            return prep_img, digest
+        
+        if pairs is None:
+            for prep_name, array in pipeline.iter_variants():
+                prep_img, digest = prepare(prep_name, array)
+                for config in configs:
+                    yield prep_name, prep_img, config, digest
+            return
         
-        # Sharpening (enhance edges)
-        kernel_sharp = np.array([[-1,-1,-1], [-1,9,-1], [-1,-1,-1]])
-        sharpened = cv2.filter2D(gray, -1, kernel_sharp)
-        processed_images.append(('Sharpened', Image.fromarray(sharpened)))
+        for prep_name, config in pairs:
+            if prep_name not in prepared:
+                array = pipeline.get(prep_name)
+                prepared[prep_name] = prepare(prep_name, array) if array is not None else None
+            if prepared[prep_name] is not None:
+                prep_img, digest = prepared[prep_name]
+                yield prep_name, prep_img, config, digest
+    
+    def single_pass_groups(self, configs):
+        """Group configs differing only in their whitelist: {pass_config: [(config, whitelist), ...]}
+        
+        pass_config is the first member's config without the whitelist;
+        whitelist is None for configs that have none.
+        """
+        groups = {}
+        keys = {}
+        for config in configs:
+            psm, oem, variables = self.ocr_engine.parse_config(config)
+            whitelist = variables.pop('tessedit_char_whitelist', None)
+            key = (psm, oem, tuple(sorted(variables.items())))
+            if key not in keys:
+                tokens = config.split()
+                if whitelist is not None:
+                    index = tokens.index('tessedit_char_whitelist=' + whitelist)
+                    del tokens[index - 1:index + 1]
+                keys[key] = ' '.join(tokens)
+            groups.setdefault(keys[key], []).append((config, whitelist))
+        return groups
+    
+    @staticmethod
+    def symbols_reading(symbols, whitelist=None):
+        """(text, mean confidence) from per-character alternatives, restricted to a whitelist
+        
+        Each position takes its best alternative inside the whitelist and is
+        dropped when it has none, as a whitelisted run would have to.
+        """
+        chars = []
+        confidences = []
+        for choices in symbols:
+            for char, confidence in choices:
+                if char == ' ':
+                    chars.append(char)
+                    break
+                if whitelist is None or all(c in whitelist for c in char):
+                    chars.append(char)
+                    confidences.append(confidence)
+                    break
+        confidence = sum(confidences) / len(confidences) if confidences else 0.0
+        return ''.join(chars).strip(), confidence
+    
+    def ocr_pass(self, prep_img, pass_config, members, prep_name=None, fallback_calls=None):
+        """One OCR call read under every member config: [(config, reading, confidence), ...]
+        
+        Falls back to one ocr_call per member (confidence None) when
+        per-character alternatives are unavailable; the calls this adds
+        beyond the pass itself are appended to the fallback_calls list.
+        """
+        start = time.perf_counter()
+        try:
+            symbols = self.ocr_engine.image_to_symbols(prep_img, config=pass_config)
+        except Exception:
+            symbols = None
+        if symbols is None:
+            if fallback_calls is not None:
+                # list.append is atomic, passes may run on several worker threads
+                fallback_calls.append(len(members))
+            return [(config, self.ocr_call(prep_img, config, prep_name), None) for config, _ in members]
+        
+        readings = []
+        for config, whitelist in members:
+            text, confidence = self.symbols_reading(symbols, whitelist)
+            readings.append((config, self.filter_ocr_result(text), round(confidence, 1)))
+        if self.telemetry is not None:
+            results = [reading for _, reading, _ in readings]
+            self.telemetry.emit('ocr_call', variant=prep_name, config=pass_config,
+                                ms=(time.perf_counter() - start) * 1000, readings=len(readings),
+                                raw=self.symbols_reading(symbols)[0], result=results,
+                                filtered=sum(reading is None for reading in results))
+        return readings
+    
+    def mosaic_configs(self, configs):
+        """Configs for mosaic OCR: every psm becomes 6 (a block of lines), duplicates dropped"""
+        mosaic = []
+        seen = set()
+        for config in configs:
+            _, oem, variables = self.ocr_engine.parse_config(config)
+            key = (oem, tuple(sorted(variables.items())))
+            if key in seen:
+                continue
+            seen.add(key)
+            mosaic.append(' '.join([f'--psm 6 --oem {oem}'] + [f'-c {k}={v}' for k, v in variables.items()]))
+        return mosaic
+    
+    def read_mosaic(self, mosaic, spans, config, variant='mosaic'):
+        """One OCR call over a mosaic, returning the filtered reading of each strip
         
-        # Contrast enhancement
-        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
-        enhanced = clahe.apply(gray)
-        processed_images.append(('Enhanced', Image.fromarray(enhanced)))
+        variant names the strips in telemetry events.
+        """
+        start = time.perf_counter()
+        try:
+            words = parse_tsv_words(self.ocr_engine.image_to_data(mosaic, config=config))
+        except Exception as e:
+            words = []
+            error = str(e)
+        else:
+            error = None
+        
+        # Words belong to the strip their vertical centre falls in
+        lines = [{} for _ in spans]
+        for word in words:
+            middle = word['top'] + word['height'] / 2
+            for index, (top, bottom) in enumerate(spans):
+                if top <= middle < bottom:
+                    lines[index].setdefault(word['line'], []).append(word)
+                    break
         
-        # Apply anti-line techniques to enhanced image too
-        enhanced_no_lines = cv2.subtract(enhanced, lines_mask)
-        processed_images.append(('EnhancedNoLines', Image.fromarray(enhanced_no_lines)))
+        texts, readings = [], []
+        for strip_lines in lines:
+            ordered = sorted(strip_lines.values(), key=lambda line: min(word['top'] for word in line))
+            text = ' '.join(' '.join(word['text'] for word in sorted(line, key=lambda word: word['left']))
+                            for line in ordered)
+            texts.append(text)
+            readings.append(self.filter_ocr_result(text))
+        
+        if self.telemetry is not None:
+            self.telemetry.emit('ocr_call', variant=variant, config=config, ms=(time.perf_counter() - start) * 1000,
+                                strips=len(spans), words=len(words), raw=texts, result=readings,
+                                filtered=sum(reading is None for reading in readings), error=error)
+        return readings
+    
+    def iter_mosaic_grid(self, pipeline, names, configs, workers=1, stats=None):
+        """Yield ((prep_name, None, config, None), reading) like iter_ocr_grid, one OCR call per config
+        
+        The requested variants (all when names is None) are stacked into
+        one mosaic, byte-identical variants sharing a strip, and each
+        config reads every strip at once. Cells come config by config.
+        """
+        if stats is None:
+            stats = {}
+        stats.setdefault('calls', 0)
+        strips, strip_of, digests = [], [], {}
+        for prep_name, array in pipeline.iter_variants(names):
+            digest = self.image_digest(array) if self.ocr_dedup else prep_name
+            if digest not in digests:
+                digests[digest] = len(strips)
+                strips.append(array)
+            strip_of.append((prep_name, digests[digest]))
+        stats['variants'] = len(strip_of)
+        stats['unique'] = len(strips)
+        if not strips:
+            return
+        mosaic, spans = build_mosaic(strips)
+        del strips
+        # Telemetry label: strips in order, variants sharing a strip joined by '='
+        strip_names = [[] for _ in spans]
+        for prep_name, index in strip_of:
+            strip_names[index].append(prep_name)
+        variant = '+'.join('='.join(names) for names in strip_names)
+        
+        if workers <= 1:
+            for config in configs:
+                readings = self.read_mosaic(mosaic, spans, config, variant)
+                stats['calls'] += 1
+                for prep_name, index in strip_of:
+                    yield (prep_name, None, config, None), readings[index]
+            return
         
-        return processed_images
+        # As in iter_ocr_grid: calls are counted on submission, two per worker in flight
+        from concurrent.futures import wait
+        executor = self.ocr_executor(workers)
+        pending = deque()
+        try:
+            for config in configs:
+                pending.append((config, executor.submit(self.read_mosaic, mosaic, spans, config, variant)))
+                stats['calls'] += 1
+                if len(pending) >= workers * 2:
+                    done_config, future = pending.popleft()
+                    readings = future.result()
+                    for prep_name, index in strip_of:
+                        yield (prep_name, None, done_config, None), readings[index]
+            while pending:
+                done_config, future = pending.popleft()
+                readings = future.result()
+                for prep_name, index in strip_of:
+                    yield (prep_name, None, done_config, None), readings[index]
+        finally:
+            for _, future in pending:
+                if future.cancel():
+                    stats['calls'] -= 1
+            wait([future for _, future in pending])
     
-    def solve_with_advanced_ocr(self, image_data):
-        """OCR with multiple configurations and preprocessing"""
-        results = []
+    def solve_with_advanced_ocr(self, image_data, workers=None, early_exit=None, deadline_ms=None,
+                                return_stats=False):
+        """OCR with multiple configurations and preprocessing
+        
+        With early_exit the grid stops as soon as the leading reading can no
+        longer be overtaken by the remaining calls (or leads by
+        ocr_early_exit_margin votes); deadline_ms stops it once the latency
+        budget is spent. With return_stats, returns (results, stats) where
+        stats reports the OCR calls actually made.
+        """
+        start = time.perf_counter()
         
         # Decode image
         if image_data.startswith('data:image'):
@@ -407,66 +2453,360 @@ class S0lvCaptcha:
             base64_data = image_data
             
         img_bytes = base64.b64decode(base64_data)
-        img = Image.open(BytesIO(img_bytes))
-        
-        # Multiple preprocessing
-        processed_images = self.preprocess_multiple(img)
-        
-        configs = [
-            # Basic configurations
-            '--psm 8 --oem 3',
-            '--psm 7 --oem 3', 
-            '--psm 6 --oem 3',
-            '--psm 13',
-            
-            # Alphanumeric only (common in CAPTCHAs)
-            '--psm 8 -c tessedit_char_whitelist=ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789',
-            '--psm 7 -c tessedit_char_whitelist=ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789',
-            '--psm 6 -c tessedit_char_whitelist=ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789',
-            
-            # Uppercase and numbers only (common)
-            '--psm 8 -c tessedit_char_whitelist=ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789',
-            '--psm 7 -c tessedit_char_whitelist=ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789',
-            
-            # Lowercase and numbers only (for cases like "bxawf8")
-            '--psm 8 -c tessedit_char_whitelist=abcdefghijklmnopqrstuvwxyz0123456789',
-            '--psm 7 -c tessedit_char_whitelist=abcdefghijklmnopqrstuvwxyz0123456789',
-            '--psm 6 -c tessedit_char_whitelist=abcdefghijklmnopqrstuvwxyz0123456789',
-            
-            # Special configurations for difficult CAPTCHAs
-            '--psm 8 --oem 1',
-            '--psm 7 --oem 1',
-            '--psm 8 --oem 2',
-            '--psm 10 --oem 3',
-            
-            # With additional configurations
-            '--psm 8 -c tessedit_char_whitelist=abcdefghijklmnopqrstuvwxyz0123456789 -c load_system_dawg=0 -c load_freq_dawg=0',
-            '--psm 7 -c tessedit_char_whitelist=abcdefghijklmnopqrstuvwxyz0123456789 -c load_system_dawg=0 -c load_freq_dawg=0'
-        ]
+        img_array = self.decode_image(img_bytes)
         
-        print(f"🔍 Testing {len(processed_images)} preprocessing types x {len(configs)} OCR configurations...")
+        return self.ocr_array(img_array, workers, early_exit, deadline_ms, return_stats, start=start)
+    
+    def decode_image(self, img_bytes):
+        """Decode encoded image bytes (PNG, JPEG, ...) into a numpy array"""
+        if self.telemetry is None:
+            return np.asarray(Image.open(BytesIO(img_bytes)))
+        start = time.perf_counter()
+        img_array = np.asarray(Image.open(BytesIO(img_bytes)))
+        self.telemetry.emit('decode', ms=(time.perf_counter() - start) * 1000, bytes=len(img_bytes),
+                            shape=list(img_array.shape))
+        return img_array
+    
+    def ocr_array(self, img_array, workers=None, early_exit=None, deadline_ms=None, return_stats=False,
+                  start=None):
+        """Local OCR grid on a decoded image array (see solve_with_advanced_ocr)"""
+        stats = {}
+        results = [(source, cleaned) for source, cleaned, _ in
+                   self.iter_ocr_array(img_array, workers, early_exit, deadline_ms, start, stats) if cleaned]
+        if return_stats:
+            return results, stats
+        return results
+    
+    def iter_ocr_array(self, img_array, workers=None, early_exit=None, deadline_ms=None, start=None, stats=None):
+        """Yield (source, reading, confidence) for each local OCR grid cell as it is read
+        
+        reading is None for cells that gave nothing usable; confidence is
+        only set in single-pass mode. Stats are written into the given dict
+        (and last_ocr_stats) once the grid ends. Closing the generator stops
+        the grid, cancelling OCR calls that have not started.
+        """
+        start = start or time.perf_counter()
+        workers = workers or self.ocr_workers
+        early_exit = self.ocr_early_exit if early_exit is None else early_exit
+        deadline_ms = deadline_ms or self.ocr_deadline_ms
+        
+        # Preprocessing variants are built lazily, as the OCR grid reaches them
+        pipeline = PreprocessPipeline(img_array, self.preprocess_stages, telemetry=self.telemetry,
+                                      options=self.preprocess_options(), context=self.preprocess_context)
+        configs = self.OCR_CONFIGS
+        
+        pairs = None
+        if self.grid_profile:
+            pairs = [(prep_name, config) for prep_name, config in self.grid_profile_pairs()
+                     if prep_name in pipeline.stages]
+            if not pairs:
+                # No pair had a hit, or none names a stage of this preprocessing spec
+                self.log("⚠️  No grid profile pair applies to this pipeline, running the full grid")
+                pairs = None
+        if pairs is not None:
+            planned = len(pairs)
+            self.log(f"🔍 Testing {planned} profiled preprocessing/OCR pairs...")
+        else:
+            planned = len(pipeline.variant_names()) * len(configs)
+            self.log(f"🔍 Testing up to {len(pipeline.variant_names())} preprocessing types x {len(configs)} OCR configurations...")
+        stats = {} if stats is None else stats
+        # Single-pass calls that fell back to one call per config, counted into calls at the end
+        fallback_calls = []
+        stats.update({'calls': 0, 'tasks': 0, 'planned': planned, 'stopped': None, 'variants': 0, 'unique': 0})
+        consensus = IncrementalConsensus()
+        
+        if self.ocr_mosaic:
+            # Profiled pairs only pick which variants and configs take part
+            names = list(dict.fromkeys(prep_name for prep_name, _ in pairs)) if pairs is not None else None
+            configs = self.mosaic_configs(configs if pairs is None else [config for _, config in pairs])
+            planned = stats['planned'] = len(names if names is not None else pipeline.variant_names()) * len(configs)
+            self.log(f"🧩 Mosaic mode: {len(configs)} OCR calls over all variants")
+            grid = self.iter_mosaic_grid(pipeline, names, configs, workers, stats)
+        elif self.ocr_single_pass:
+            # One call per variant and (psm, oem); whitelisted readings are derived from it
+            groups = self.single_pass_groups(configs if pairs is None else [config for _, config in pairs])
+            pass_of = {config: pass_config for pass_config, members in groups.items() for config, _ in members}
+            if pairs is not None:
+                pairs = list(dict.fromkeys((prep_name, pass_of[config]) for prep_name, config in pairs))
+                planned = stats['planned'] = sum(len(groups[pass_config]) for _, pass_config in pairs)
+            self.log(f"🔡 Single pass: {len(groups)} OCR calls per variant for {len(pass_of)} configurations")
+            tasks = self.iter_ocr_tasks(pipeline, list(groups), pairs, stats)
+            grid = self.iter_ocr_grid(tasks, workers, stats,
+                                      call=lambda img, config, name: self.ocr_pass(img, config, groups[config], name,
+                                                                                   fallback_calls))
+        else:
+            tasks = self.iter_ocr_tasks(pipeline, configs, pairs, stats)
+            grid = self.iter_ocr_grid(tasks, workers, stats)
         
-        for prep_name, prep_img in processed_images:
-            for config in configs:
-                try:
-                    result = pytesseract.image_to_string(prep_img, config=config).strip()
-                    # Filter results more strictly for CAPTCHAs with lines
-                    if result and len(result) >= 3 and len(result) <= 12:
-                        # Clean result
-                        cleaned = ''.join(c for c in result if c.isalnum())
-                        
-                        # Additional filters to discard OCR confused by lines
-                        if (len(cleaned) >= 3 and 
-                            not cleaned.lower() in ['bets', 'bests', 'pets', 'pats', 'ets', 'ests', 'sees', 'sess', 'pss', 'ess'] and
-                            not all(c in 'se' for c in cleaned.lower()) and  # Avoid only 's' and 'e'
-                            not cleaned.lower().startswith('dav') and  # Avoid "Davessi" etc
-                            len(set(cleaned.lower())) > 2):  # Must have at least 3 different chars
-                            
-                            results.append((f'OCR_{prep_name}', cleaned))
-                except Exception:
-                    continue
+        if self.ocr_single_pass and not self.ocr_mosaic:
+            cells = ((task, cleaned, confidence) for task, readings in grid for _, cleaned, confidence in readings)
+        else:
+            cells = ((task, cleaned, None) for task, cleaned in grid)
+        confidences = {}
+        settled = consensus.characters_settled if self.consensus_mode == 'characters' else consensus.is_settled
+        try:
+            for (prep_name, _, _, _), cleaned, confidence in cells:
+                stats['tasks'] += 1
+                if cleaned:
+                    consensus.add(cleaned, f'OCR_{prep_name}')
+                    if confidence is not None:
+                        confidences[cleaned] = max(confidence, confidences.get(cleaned, 0.0))
+                yield f'OCR_{prep_name}', cleaned, confidence
+                if early_exit and settled(planned - stats['tasks'], self.ocr_early_exit_margin):
+                    stats['stopped'] = 'settled'
+                    break
+                if deadline_ms and (time.perf_counter() - start) * 1000 >= deadline_ms:
+                    stats['stopped'] = 'deadline'
+                    break
+        except GeneratorExit:
+            stats['stopped'] = stats['stopped'] or 'cancelled'
+            raise
+        finally:
+            grid.close()
+            # The grid counts one call per pass, a fallback pass made len(members) calls instead
+            stats['calls'] += sum(calls - 1 for calls in fallback_calls)
+            stats['elapsed_ms'] = round((time.perf_counter() - start) * 1000, 1)
+            stats['stage_ms'] = {name: round(ms, 3) for name, ms in pipeline.timings.items()}
+            stats.update(pipeline.info)
+            if confidences:
+                stats['confidences'] = confidences
+            self.last_ocr_stats = stats
+            if self.telemetry is not None:
+                self.telemetry.emit('ocr_grid', **{k: v for k, v in stats.items() if k not in ('stage_ms', 'confidences')})
+            if stats['stopped']:
+                self.log(f"   ⏱️  Stopped early ({stats['stopped']}) after {stats['tasks']}/{planned} grid cells")
+    
+    def glyph_reading(self, img_array):
+        """(text, confidence) from the glyph classifier, None without a model or a usable reading"""
+        if self.glyph_model is None:
+            return None
+        start = time.perf_counter()
+        text, confidence = self.glyph_model.read(img_array, self.preprocess_options())
+        cleaned = self.filter_ocr_result(text)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        if self.telemetry is not None:
+            self.telemetry.emit('glyphs', ms=elapsed_ms, raw=text, result=cleaned, confidence=confidence)
+        if cleaned is None:
+            self.log(f"   🔤 Glyphs: no reading ({elapsed_ms:.1f} ms)")
+            return None
+        self.log(f"   🔤 Glyphs: '{cleaned}' ({confidence}%, {elapsed_ms:.1f} ms)")
+        return cleaned, confidence
+    
+    def local_results(self, img_array, start=None, **ocr_options):
+        """Glyph classifier reading (if a model is loaded) followed by the local OCR grid
+        
+        When the glyph reading is at least glyph_threshold confident,
+        Tesseract is not run at all.
+        """
+        return [(source, reading) for source, reading, _ in self.iter_local_results(img_array, start, **ocr_options)
+                if reading]
+    
+    def iter_local_results(self, img_array, start=None, **ocr_options):
+        """local_results as a stream of (source, reading, confidence), see iter_ocr_array"""
+        start = start or time.perf_counter()
+        glyphs = self.glyph_reading(img_array)
+        if glyphs is not None:
+            yield 'Glyphs', glyphs[0], None
+            if self.glyph_threshold is not None and glyphs[1] >= self.glyph_threshold:
+                self.last_ocr_stats = {'calls': 0, 'tasks': 0, 'stopped': 'glyphs',
+                                       'elapsed_ms': round((time.perf_counter() - start) * 1000, 3)}
+                return
+        yield from self.iter_ocr_array(img_array, start=start, **ocr_options)
+    
+    def train_glyph_model(self, corpus_dir, output_path='glyph_model.npz'):
+        """Train the glyph classifier on a labeled corpus and save it"""
+        def samples():
+            for _, data, label in iter_labeled_samples(corpus_dir):
+                yield self.decode_image(data) if isinstance(data, bytes) else data, label
+        
+        self.log(f"🔤 Training glyph classifier on {corpus_dir}...")
+        model = GlyphClassifier.train(samples(), self.preprocess_options())
+        model.save(output_path)
+        self.glyph_model = model
+        self.log(f"📊 {model.trained['images']} images, {model.trained['glyphs']} glyphs "
+                 f"({model.trained['skipped']} images skipped: segmentation did not match the label)")
+        self.log(f"💾 Glyph model saved to {output_path}")
+        return model
+    
+    def profile_grid(self, corpus_dir, output_path='grid_profile.json'):
+        """Measure hit rate and cost of every preprocessing/config pair on a labeled corpus"""
+        pairs = {}
+        images = 0
         
-        return results
+        for image_path, data, label in iter_labeled_samples(corpus_dir):
+            try:
+                img_array = self.decode_image(data) if isinstance(data, bytes) else data
+            except Exception as e:
+                self.log(f"   ❌ {image_path}: {e}")
+                continue
+            
+            images += 1
+            self.log(f"📁 Profiling {image_path} (label '{label}')")
+            pipeline = PreprocessPipeline(img_array, self.preprocess_stages, options=self.preprocess_options())
+            for prep_name, prep_img in pipeline.iter_variants():
+                for config in self.OCR_CONFIGS:
+                    start = time.perf_counter()
+                    cleaned = self.ocr_call(prep_img, config)
+                    elapsed_ms = (time.perf_counter() - start) * 1000
+                    
+                    pair = pairs.setdefault((prep_name, config), {'calls': 0, 'hits': 0, 'total_ms': 0.0})
+                    pair['calls'] += 1
+                    pair['total_ms'] += elapsed_ms
+                    if cleaned == label:
+                        pair['hits'] += 1
+        
+        ranked = []
+        for (prep_name, config), pair in pairs.items():
+            ranked.append({
+                'prep': prep_name,
+                'config': config,
+                'calls': pair['calls'],
+                'hits': pair['hits'],
+                'total_ms': round(pair['total_ms'], 3),
+                # Hit rate per millisecond: (hits / calls) / (total_ms / calls)
+                'score': pair['hits'] / pair['total_ms'] if pair['total_ms'] > 0 else 0.0
+            })
+        ranked.sort(key=lambda p: p['score'], reverse=True)
+        
+        profile = {'version': 1, 'images': images, 'pairs': ranked}
+        with open(output_path, 'w') as f:
+            json.dump(profile, f, indent=2)
+        
+        useful = sum(1 for p in ranked if p['hits'])
+        self.log(f"💾 Grid profile saved to {output_path}")
+        self.log(f"📊 {images} images, {useful}/{len(ranked)} pairs produced a correct answer")
+        return profile
+    
+    def buffer_pool_report(self, images):
+        """Buffer pool counters for a benchmark report, None without a pool"""
+        if self.preprocess_context is None:
+            return None
+        stats = self.preprocess_context.stats()
+        stats['reused_mb_per_image'] = round(stats['reused_mb'] / images, 3) if images else 0.0
+        stats['reuse_rate'] = round(stats['reused'] / ((stats['reused'] + stats['allocated']) or 1), 3)
+        return stats
+    
+    def save_preprocess_spec(self, output_path, stage_ms=None):
+        """Write the preprocessing spec in use as JSON, with cost_ms from stage_ms (e.g. a benchmark's)"""
+        spec = dict(self.preprocess_spec)
+        spec['stages'] = [dict(entry) for entry in spec['stages']]
+        for entry in spec['stages']:
+            if stage_ms and entry['name'] in stage_ms:
+                entry['cost_ms'] = stage_ms[entry['name']]
+        with open(output_path, 'w') as f:
+            json.dump(spec, f, indent=2)
+        self.log(f"💾 Preprocessing spec saved to {output_path}")
+        return spec
+    
+    def load_grid_profile(self, profile_path, top_k=None):
+        """Restrict local OCR to the top_k pairs of a saved grid profile"""
+        with open(profile_path, 'r') as f:
+            self.grid_profile = json.load(f)
+        self.grid_top_k = top_k
+        return self.grid_profile
+    
+    def grid_profile_pairs(self):
+        """(prep_name, config) pairs with hits, best score first, at most grid_top_k of them"""
+        pairs = sorted((p for p in self.grid_profile['pairs'] if p['hits']), key=lambda p: p['score'], reverse=True)
+        if self.grid_top_k:
+            pairs = pairs[:self.grid_top_k]
+        return [(p['prep'], p['config']) for p in pairs]
+    
+    def benchmark(self, corpus_dir, output_path='bench_results.json'):
+        """Run the local pipeline over a labeled corpus and save accuracy/latency metrics"""
+        per_image = []
+        stage_totals = Counter()
+        
+        self.log(f"⏱️  Benchmarking local OCR on {corpus_dir}...")
+        first_image = None
+        for image_path, data, label in iter_labeled_samples(corpus_dir):
+            if first_image is None:
+                first_image = data
+            start = time.perf_counter()
+            # Console output would be part of the measured latency
+            with redirect_stdout(io.StringIO()):
+                ocr_results = self.local_results(self.decode_image(data) if isinstance(data, bytes) else data)
+                best_solution, confidence, sources = self.smart_consensus(ocr_results,
+                                                                          self.last_ocr_stats.get('confidences'))
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            
+            stats = self.last_ocr_stats
+            stage_totals.update(stats.get('stage_ms', {}))
+            per_image.append({
+                'path': image_path,
+                'label': label,
+                'solution': best_solution,
+                'correct': best_solution == label,
+                'confidence': confidence,
+                'ms': round(elapsed_ms, 3),
+                'calls': stats.get('calls', 0),
+                'grid_cells': stats.get('tasks', 0),
+                'scale': stats.get('scale')
+            })
+            mark = '✅' if best_solution == label else '❌'
+            self.log(f"   {mark} {os.path.basename(image_path)}: '{best_solution}' ({elapsed_ms:.0f} ms, {stats.get('calls', 0)} OCR calls)")
+        
+        count = len(per_image)
+        latencies = [entry['ms'] for entry in per_image]
+        report = {
+            'version': 1,
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'corpus': corpus_dir,
+            'images': count,
+            'settings': {
+                'engine': 'tesserocr' if self.ocr_engine.native else 'pytesseract',
+                'workers': self.ocr_workers,
+                'dedup': self.ocr_dedup,
+                'early_exit': self.ocr_early_exit,
+                'early_exit_margin': self.ocr_early_exit_margin,
+                'deadline_ms': self.ocr_deadline_ms,
+                'crop_text': self.ocr_crop_text,
+                'resolution': self.ocr_resolution,
+                'scale': self.ocr_scale,
+                'buffer_pool': self.preprocess_context is not None,
+                'mosaic': self.ocr_mosaic,
+                'single_pass': self.ocr_single_pass,
+                'glyph_model': self.glyph_model is not None,
+                'glyph_threshold': self.glyph_threshold,
+                'consensus': self.consensus_mode,
+                'preprocess_variants': sum(1 for stage in self.preprocess_stages if stage.variant),
+                'preprocess_cost_ms': plan_cost(self.preprocess_stages),
+                'grid_top_k': self.grid_top_k if self.grid_profile else None
+            },
+            'accuracy': sum(entry['correct'] for entry in per_image) / count if count else 0.0,
+            'latency_ms': {
+                'mean': round(sum(latencies) / count, 3) if count else 0.0,
+                'p50': round(float(np.percentile(latencies, 50)), 3) if count else 0.0,
+                'p95': round(float(np.percentile(latencies, 95)), 3) if count else 0.0,
+                'p99': round(float(np.percentile(latencies, 99)), 3) if count else 0.0,
+                'max': round(max(latencies), 3) if count else 0.0
+            },
+            'ocr_calls_per_image': sum(entry['calls'] for entry in per_image) / count if count else 0.0,
+            'grid_cells_per_image': sum(entry['grid_cells'] for entry in per_image) / count if count else 0.0,
+            'peak_rss_mb': peak_rss_mb(),
+            'stage_ms_per_image': {name: round(total / count, 3) for name, total in stage_totals.most_common()},
+            'by_scale': scale_breakdown(per_image),
+            'buffer_pool': self.buffer_pool_report(count),
+            'per_image': per_image
+        }
+        
+        # Import + first solve in a fresh interpreter, as a short-lived worker sees it
+        if isinstance(first_image, bytes) or first_image is None:
+            report['startup'] = measure_startup(per_image[0]['path'] if per_image else None)
+        else:
+            import tempfile
+            with tempfile.TemporaryDirectory() as directory:
+                image_path = os.path.join(directory, 'first.png')
+                Image.fromarray(first_image).save(image_path)
+                report['startup'] = measure_startup(image_path)
+        
+        with open(output_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        
+        if not self.quiet:
+            print_benchmark(report)
+        self.log(f"💾 Benchmark saved to {output_path}")
+        return report
     
     def solve_with_2captcha(self, image_data):
         """Solve with 2captcha"""
@@ -502,7 +2842,7 @@ class S0lvCaptcha:
                     break
                     
         except Exception as e:
-            print(f"   ❌ Error 2captcha: {e}")
+            self.log(f"   ❌ Error 2captcha: {e}")
             
         return None
     
@@ -550,7 +2890,7 @@ class S0lvCaptcha:
                     break
                     
         except Exception as e:
-            print(f"   ❌ Error AntiCaptcha: {e}")
+            self.log(f"   ❌ Error AntiCaptcha: {e}")
             
         return None
     
@@ -598,146 +2938,355 @@ class S0lvCaptcha:
                     break
                     
         except Exception as e:
-            print(f"   ❌ Error CapMonster: {e}")
+            self.log(f"   ❌ Error CapMonster: {e}")
             
         return None
     
-    def smart_consensus(self, all_results):
-        """Smart consensus that weighs different sources"""
+    def smart_consensus(self, all_results, ocr_confidences=None):
+        """Smart consensus that weighs different sources
+        
+        ocr_confidences ({solution: character confidence}, from single-pass
+        OCR) breaks ties between equally frequent OCR readings.
+        """
+        if self.telemetry is None:
+            return self.consensus_decision(all_results, ocr_confidences)
+        start = time.perf_counter()
+        best_solution, confidence, sources = self.consensus_decision(all_results, ocr_confidences)
+        self.telemetry.emit('consensus', ms=(time.perf_counter() - start) * 1000, results=len(all_results),
+                            solution=best_solution, confidence=confidence, sources=sources)
+        return best_solution, confidence, sources
+    
+    def consensus_decision(self, all_results, ocr_confidences=None):
+        """Pick the solution from all results (see smart_consensus)"""
         if not all_results:
             return None, 0, []
         
-        # Separate by source type
-        external_services = []
-        ocr_results = []
-        
+        # One pass builds the vote counts and the solution -> sources index
+        consensus = IncrementalConsensus()
+        external = IncrementalConsensus()
+        ocr = IncrementalConsensus()
         for method, solution in all_results:
-            if method in ['2captcha', 'AntiCaptcha', 'CapMonster']:
-                external_services.append((method, solution))
+            consensus.add(solution, method)
+            if method in self.EXTERNAL_SOURCES:
+                external.add(solution, method)
             else:
-                ocr_results.append((method, solution))
-        
-        # Frequency analysis
-        all_solutions = [result[1] for result in all_results]
-        frequency = Counter(all_solutions)
+                ocr.add(solution, method)
         
-        print(f"📊 Consensus analysis:")
-        for solution, count in frequency.most_common():
-            sources = [result[0] for result in all_results if result[1] == solution]
-            external_count = sum(1 for s in sources if s in ['2captcha', 'AntiCaptcha', 'CapMonster'])
-            ocr_count = len(sources) - external_count
+        self.log(f"📊 Consensus analysis:")
+        for solution, count in consensus.counts.most_common():
+            external_count = external.counts[solution]
+            ocr_count = count - external_count
             
-            print(f"   '{solution}': {count} times")
+            self.log(f"   '{solution}': {count} times")
             if external_count > 0:
-                print(f"      External services: {external_count}")
+                self.log(f"      External services: {external_count}")
             if ocr_count > 0:
-                print(f"      Local OCR: {ocr_count}")
+                self.log(f"      Local OCR: {ocr_count}")
         
         # Decision logic
         # 1. If there's consensus among external services, use it
-        if len(external_services) >= 2:
-            external_solutions = [result[1] for result in external_services]
-            external_freq = Counter(external_solutions)
-            if external_freq.most_common(1)[0][1] >= 2:
-                best_solution = external_freq.most_common(1)[0][0]
-                confidence = min(95, 70 + external_freq.most_common(1)[0][1] * 10)
-                sources = [result[0] for result in external_services if result[1] == best_solution]
-                return best_solution, confidence, sources
+        if external.total >= 2:
+            best_solution, count = external.leader()
+            if count >= 2:
+                confidence = min(95, 70 + count * 10)
+                return best_solution, confidence, list(external.sources[best_solution])
         
         # 2. If there's one external service, prioritize over OCR
-        if external_services:
-            best_solution = external_services[0][1]
+        if external.total:
+            method, best_solution = next(result for result in all_results if result[0] in self.EXTERNAL_SOURCES)
             confidence = 75
-            sources = [external_services[0][0]]
+            sources = [method]
             
             # Check if OCR agrees
-            ocr_solutions = [result[1] for result in ocr_results]
-            if best_solution in ocr_solutions:
+            if best_solution in ocr.counts:
                 confidence = 85
-                sources.extend([result[0] for result in ocr_results if result[1] == best_solution][:2])
+                sources.extend(ocr.sources[best_solution][:2])
             
             return best_solution, confidence, sources
         
         # 3. Only OCR available - look for consensus
-        if ocr_results:
-            best_solution, count = frequency.most_common(1)[0]
+        if ocr.total:
+            best_solution, count = ocr.leader()
+            if ocr_confidences:
+                tied = [solution for solution, n in ocr.counts.items() if n == count]
+                best_solution = max(tied, key=lambda solution: ocr_confidences.get(solution, 0.0))
+            if self.consensus_mode == 'characters':
+                # Position-aligned voting combines readings that are each partly wrong
+                combined, support = ocr.character_reading()
+                if support > count:
+                    self.log(f"   🔠 Character vote: '{combined}' (every position has {support}+ votes)")
+                    best_solution, count = combined, support
             confidence = min(70, 30 + count * 15)
-            sources = [result[0] for result in ocr_results if result[1] == best_solution][:3]
+            sources = ocr.sources.get(best_solution, ['OCR_characters'])[:3]
             return best_solution, confidence, sources
         
         return None, 0, []
     
     def solve_captcha(self, image_data, save_debug=False):
         """Main improved method"""
-        print("\n" + "="*80)
-        print("🎯 STARTING CAPTCHA SOLVING PROCESS")
-        print("="*80)
+        self.log("\n" + "="*80)
+        self.log("🎯 STARTING CAPTCHA SOLVING PROCESS")
+        self.log("="*80)
         
+        start = time.perf_counter()
         all_results = []
         
+        # Decode once: the pixels key the result cache and feed local OCR
+        base64_data = image_data.split(',')[1] if image_data.startswith('data:image') else image_data
+        img_array = self.decode_image(base64.b64decode(base64_data))
+        scope = self.cache_scope('services:' + ','.join(sorted(self.services)))
+        cached = self.cached_result(img_array, scope)
+        if cached is not None:
+            return cached
+        
         # 1. Local OCR
-        print("📝 Running local OCR...")
-        ocr_results = self.solve_with_advanced_ocr(image_data)
+        self.log("📝 Running local OCR...")
+        ocr_results = self.local_results(img_array, start=start)
         all_results.extend(ocr_results)
         
         if ocr_results:
-            print(f"   ✅ OCR: {len(ocr_results)} results")
+            self.log(f"   ✅ OCR: {len(ocr_results)} results ({self.last_ocr_stats.get('calls', 0)} OCR calls)")
         else:
-            print("   ❌ OCR no results")
+            self.log("   ❌ OCR no results")
         
         # 2. External services
-        print("🌐 Testing external services...")
+        self.log("🌐 Testing external services...")
         
         if '2captcha' in self.services:
-            print("   🔹 Testing 2captcha...")
+            self.log("   🔹 Testing 2captcha...")
             result_2captcha = self.solve_with_2captcha(image_data)
             if result_2captcha:
                 all_results.append(('2captcha', result_2captcha))
-                print(f"      ✅ 2captcha: '{result_2captcha}'")
+                self.log(f"      ✅ 2captcha: '{result_2captcha}'")
             else:
-                print("      ❌ 2captcha failed")
+                self.log("      ❌ 2captcha failed")
         
         if 'anticaptcha' in self.services:
-            print("   🔹 Testing AntiCaptcha...")
+            self.log("   🔹 Testing AntiCaptcha...")
             result_anticaptcha = self.solve_with_anticaptcha(image_data)
             if result_anticaptcha:
                 all_results.append(('AntiCaptcha', result_anticaptcha))
-                print(f"      ✅ AntiCaptcha: '{result_anticaptcha}'")
+                self.log(f"      ✅ AntiCaptcha: '{result_anticaptcha}'")
             else:
-                print("      ❌ AntiCaptcha failed")
+                self.log("      ❌ AntiCaptcha failed")
         
         if 'capmonster' in self.services:
-            print("   🔹 Testing CapMonster...")
+            self.log("   🔹 Testing CapMonster...")
             result_capmonster = self.solve_with_capmonster(image_data)
             if result_capmonster:
                 all_results.append(('CapMonster', result_capmonster))
-                print(f"      ✅ CapMonster: '{result_capmonster}'")
+                self.log(f"      ✅ CapMonster: '{result_capmonster}'")
             else:
-                print("      ❌ CapMonster failed")
+                self.log("      ❌ CapMonster failed")
         
         # 3. Smart consensus
-        print("\n🎯 Analyzing consensus...")
-        best_solution, confidence, sources = self.smart_consensus(all_results)
+        self.log("\n🎯 Analyzing consensus...")
+        best_solution, confidence, sources = self.smart_consensus(all_results, self.last_ocr_stats.get('confidences'))
         
         # Debug
         if save_debug:
-            try:
-                base64_data = image_data.split(',')[1] if image_data.startswith('data:image') else image_data
-                img_bytes = base64.b64decode(base64_data)
-                img = Image.open(BytesIO(img_bytes))
-                img.save('debug_s0lvcaptcha_original.png')
-                print("🖼️  Debug saved: debug_s0lvcaptcha_original.png")
-            except Exception as e:
-                print(f"Debug error: {e}")
+            self.save_debug_original(image_data)
         
+        if self.result_cache is not None:
+            self.result_cache.put(img_array, (all_results, best_solution, confidence, sources), scope)
+        if self.telemetry is not None:
+            self.telemetry.emit('solve', ms=(time.perf_counter() - start) * 1000, local_only=False,
+                                results=len(all_results), solution=best_solution, confidence=confidence)
         return all_results, best_solution, confidence, sources
     
+    def settings_fingerprint(self):
+        """Short hash of the settings that change solve results, part of every cache scope"""
+        glyphs = None
+        if self.glyph_model is not None:
+            if self.glyph_digest is None or self.glyph_digest[0] is not self.glyph_model:
+                digest = hashlib.blake2b(self.glyph_model.features.tobytes(), digest_size=8)
+                digest.update(json.dumps(self.glyph_model.labels.tolist()).encode())
+                self.glyph_digest = (self.glyph_model, digest.hexdigest())
+            glyphs = self.glyph_digest[1]
+        settings = {
+            'configs': self.OCR_CONFIGS,
+            'lang': self.ocr_engine.lang,
+            'preprocess': self.preprocess_spec['stages'],
+            'options': self.preprocess_options(),
+            'early_exit': [self.ocr_early_exit, self.ocr_early_exit_margin, self.ocr_deadline_ms],
+            'mosaic': self.ocr_mosaic,
+            'single_pass': self.ocr_single_pass,
+            'consensus': self.consensus_mode,
+            'glyphs': [glyphs, self.glyph_threshold],
+            'grid': self.grid_profile_pairs() if self.grid_profile else None
+        }
+        return hashlib.blake2b(json.dumps(settings, sort_keys=True, default=str).encode(), digest_size=8).hexdigest()
+    
+    def cache_scope(self, base):
+        """Result cache scope: base plus the settings fingerprint, so other settings never share entries"""
+        return f'{base}:{self.settings_fingerprint()}'
+    
+    def cached_result(self, img_array, scope):
+        """Result of an earlier solve of the same pixels, None on a miss or without a cache"""
+        if self.result_cache is None:
+            return None
+        cached = self.result_cache.get(img_array, scope)
+        if self.telemetry is not None:
+            self.telemetry.emit('cache', hit=cached is not None, scope=scope, **self.result_cache.stats())
+        if cached is not None:
+            # Nothing ran: the stats of the previous solve must not be reported for this one
+            self.last_ocr_stats = {'calls': 0, 'tasks': 0, 'stopped': 'cached', 'cached': True, 'elapsed_ms': 0.0}
+            self.log(f"♻️  Cached result: '{cached[1]}' (confidence {cached[2]}%)")
+        return cached
+    
+    def solve_array(self, img_array, save_debug=False, **ocr_options):
+        """Local OCR solve of a decoded uint8 image array (H x W or H x W x C, RGB)
+        
+        Pixels go from the array to the OCR engine without base64, PIL or
+        temporary files. External services are not used. ocr_options are
+        passed to ocr_array (workers, early_exit, deadline_ms); they are not
+        part of the result cache key.
+        """
+        start = time.perf_counter()
+        img_array = np.ascontiguousarray(img_array, dtype=np.uint8)
+        cached = self.cached_result(img_array, self.cache_scope('local'))
+        if cached is not None:
+            return cached
+        
+        self.log("📝 Running local OCR...")
+        ocr_results = self.local_results(img_array, **ocr_options)
+        return self.local_decision(img_array, ocr_results, self.last_ocr_stats.get('confidences'), start, save_debug)
+    
+    def local_decision(self, img_array, ocr_results, ocr_confidences, start, save_debug=False):
+        """Consensus over local results, cached and reported like solve_array"""
+        if ocr_results:
+            self.log(f"   ✅ OCR: {len(ocr_results)} results ({self.last_ocr_stats.get('calls', 0)} OCR calls)")
+        else:
+            self.log("   ❌ OCR no results")
+        
+        self.log("\n🎯 Analyzing consensus...")
+        best_solution, confidence, sources = self.smart_consensus(ocr_results, ocr_confidences)
+        
+        if save_debug:
+            self.save_debug_original(img_array)
+        
+        if self.result_cache is not None:
+            self.result_cache.put(img_array, (ocr_results, best_solution, confidence, sources),
+                                  self.cache_scope('local'))
+        if self.telemetry is not None:
+            self.telemetry.emit('solve', ms=(time.perf_counter() - start) * 1000, local_only=True,
+                                results=len(ocr_results), solution=best_solution, confidence=confidence)
+        return ocr_results, best_solution, confidence, sources
+    
+    def save_debug_original(self, image):
+        """Save the input image as debug_s0lvcaptcha_original.png
+        
+        image is a pixel array, or encoded bytes / a base64 string saved as
+        PIL reads them: the array of a palette or LA image has lost its
+        palette and alpha.
+        """
+        try:
+            if isinstance(image, str):
+                image = base64.b64decode(image.split(',')[1] if image.startswith('data:image') else image)
+            if isinstance(image, (bytes, bytearray, memoryview)):
+                img = Image.open(BytesIO(bytes(image)))
+            else:
+                img = Image.fromarray(image)
+            img.save('debug_s0lvcaptcha_original.png')
+            self.log("🖼️  Debug saved: debug_s0lvcaptcha_original.png")
+        except Exception as e:
+            self.log(f"Debug error: {e}")
+    
+    def solve_bytes(self, img_bytes, save_debug=False, **ocr_options):
+        """Local OCR solve of encoded image bytes (PNG, JPEG, ...), see solve_array"""
+        result = self.solve_array(self.decode_image(img_bytes), **ocr_options)
+        if save_debug:
+            self.save_debug_original(img_bytes)
+        return result
+    
+    def image_array(self, image):
+        """uint8 pixel array from a decoded array, encoded bytes or a base64 / data:image string"""
+        if isinstance(image, str):
+            image = base64.b64decode(image.split(',')[1] if image.startswith('data:image') else image)
+        if isinstance(image, (bytes, bytearray, memoryview)):
+            image = self.decode_image(bytes(image))
+        return np.ascontiguousarray(image, dtype=np.uint8)
+    
+    async def iter_local(self, image, executor=None, **ocr_options):
+        """Async stream of (source, reading, confidence) from the glyph model and local OCR grid
+        
+        Decoding, preprocessing and OCR run on executor (the event loop's
+        default executor when None), one grid cell at a time, so the loop is
+        never blocked. image is anything image_array accepts; ocr_options go
+        to iter_ocr_array. Leaving the iteration early (break, then aclose)
+        or cancelling the awaiting task stops the remaining grid work.
+        """
+        import asyncio
+        loop = asyncio.get_running_loop()
+        img_array = await loop.run_in_executor(executor, self.image_array, image)
+        cells = self.iter_local_results(img_array, **ocr_options)
+        # A generator cannot be closed while a worker thread is inside next()
+        lock = threading.Lock()
+        
+        def step():
+            with lock:
+                return next(cells, None)
+        
+        def close():
+            with lock:
+                cells.close()
+        
+        try:
+            while True:
+                cell = await loop.run_in_executor(executor, step)
+                if cell is None:
+                    return
+                yield cell
+        finally:
+            # Not awaited: the caller goes on while the in-flight call finishes and the rest is cancelled
+            loop.run_in_executor(executor, close)
+    
+    async def solve_local(self, image, executor=None, save_debug=False, **ocr_options):
+        """Awaitable solve_array: (results, best_solution, confidence, sources) without blocking the loop
+        
+        See iter_local for image, executor and ocr_options; the result cache
+        and consensus also run on executor. Cancelling
+        the awaiting task stops the remaining OCR grid work.
+        """
+        import asyncio
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        img_array = await loop.run_in_executor(executor, self.image_array, image)
+        # Cache lookups hash and query sqlite, consensus and the cache store run there too
+        cached = await loop.run_in_executor(executor, self.cached_result, img_array, self.cache_scope('local'))
+        if cached is not None:
+            return cached
+        
+        self.log("📝 Running local OCR...")
+        ocr_results = []
+        confidences = {}
+        cells = self.iter_local(img_array, executor, **ocr_options)
+        try:
+            async for source, reading, confidence in cells:
+                if reading:
+                    ocr_results.append((source, reading))
+                    if confidence is not None:
+                        confidences[reading] = max(confidence, confidences.get(reading, 0.0))
+        finally:
+            await cells.aclose()
+        encoded = isinstance(image, (str, bytes, bytearray, memoryview))
+        result = await loop.run_in_executor(executor, self.local_decision, img_array, ocr_results,
+                                            confidences or None, start, save_debug and not encoded)
+        if save_debug and encoded:
+            await loop.run_in_executor(executor, self.save_debug_original, image)
+        return result
+    
     def solve_from_file(self, image_path, save_debug=False):
         """Solve from file"""
         try:
             with open(image_path, 'rb') as f:
                 img_bytes = f.read()
             
+            # Without external services there is nothing to base64-encode for
+            if not self.services:
+                self.log(f"📁 Processing: {image_path}")
+                return self.solve_bytes(img_bytes, save_debug)
+            
             img_b64 = base64.b64encode(img_bytes).decode()
             
             if image_path.lower().endswith('.png'):
@@ -747,30 +3296,240 @@ class S0lvCaptcha:
             else:
                 image_data = f"data:image/png;base64,{img_b64}"
             
-            print(f"📁 Processing: {image_path}")
+            self.log(f"📁 Processing: {image_path}")
             return self.solve_captcha(image_data, save_debug)
             
         except Exception as e:
-            print(f"❌ Error: {e}")
+            self.log(f"❌ Error: {e}")
             return [], None, 0, []
 
+def iter_image_paths(directory=None, list_stream=None):
+    """Stream image paths from a directory and/or a file list (one path per line)
+
+    Paths are produced as they are found, so huge directories are never
+    listed into memory at once.
+    """
+    if directory:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                    yield entry.path
+    if list_stream is not None:
+        for line in list_stream:
+            path = line.strip()
+            if path:
+                yield path
+
+
+# Solver of a batch worker process, created once by init_batch_worker
+BATCH_SOLVER = None
+
+
+def init_batch_worker(options, cache_path=None, cache_near=False, telemetry_path=None):
+    """Create the quiet library-mode solver a batch worker reuses for every image
+
+    The cache and telemetry file are opened here, in the worker; telemetry
+    events of all workers are appended to the same JSON-lines file.
+    """
+    global BATCH_SOLVER
+    cache = ResultCache(path=cache_path, near_duplicates=cache_near) if cache_path else None
+    telemetry = Telemetry(JsonLinesSink(telemetry_path)) if telemetry_path else None
+    # A worker solves one image at a time, so it can reuse preprocessing buffers
+    BATCH_SOLVER = S0lvCaptcha(SolverConfig(cache=cache, telemetry=telemetry, **dict(options, buffer_pool=True)))
+
+
+def solve_batch_item(path):
+    """Local OCR solve of one file, as a JSON-serializable record"""
+    start = time.perf_counter()
+    try:
+        with open(path, 'rb') as f:
+            img_bytes = f.read()
+        all_results, best_solution, confidence, sources = BATCH_SOLVER.solve_bytes(img_bytes)
+    except Exception as e:
+        return {'path': path, 'error': str(e)}
+    
+    stats = BATCH_SOLVER.last_ocr_stats
+    return {
+        'path': path,
+        'best_solution': best_solution,
+        'confidence': confidence,
+        'sources': sources,
+        'cached': stats.get('cached', False),
+        'scale': stats.get('scale'),
+        'timings': {
+            'total_ms': round((time.perf_counter() - start) * 1000, 3),
+            'ocr_ms': stats.get('elapsed_ms'),
+            'ocr_calls': stats.get('calls')
+        }
+    }
+
+
+def run_batch(paths, options, jobs=1, output=None, cache_path=None, cache_near=False, telemetry_path=None):
+    """Solve many images locally, writing one JSON line per image as soon as it finishes
+
+    With jobs > 1, images go to a process pool with at most two images per
+    worker in flight, so memory stays flat however many paths there are.
+    Lines come out in completion order. Returns the number of images.
+    """
+    output = output or sys.stdout
+    count = 0
+    
+    def write(record):
+        output.write(json.dumps(record) + '\n')
+        output.flush()
+    
+    if jobs <= 1:
+        init_batch_worker(options, cache_path, cache_near, telemetry_path)
+        for path in paths:
+            write(solve_batch_item(path))
+            count += 1
+        return count
+    
+    from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+    with ProcessPoolExecutor(max_workers=jobs, initializer=init_batch_worker,
+                             initargs=(options, cache_path, cache_near, telemetry_path)) as executor:
+        pending = set()
+        for path in paths:
+            pending.add(executor.submit(solve_batch_item, path))
+            if len(pending) >= jobs * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    write(future.result())
+                    count += 1
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                write(future.result())
+                count += 1
+    return count
+
+
+def positive_int(value):
+    """argparse type for integers >= 1"""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+    return number
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='s0lvcaptcha - Multi-service CAPTCHA solver')
     parser.add_argument('-i', '--image', help='Image file path')
     parser.add_argument('-u', '--url', help='Data:image URL')
     parser.add_argument('-c', '--config', action='store_true', help='Manage configuration')
     parser.add_argument('--reset', action='store_true', help='Reset configuration')
+    parser.add_argument('-w', '--workers', type=int, default=1, help='Parallel local OCR workers')
+    parser.add_argument('--early-exit', action='store_true', help='Stop local OCR once the answer is settled')
+    parser.add_argument('--margin', type=int, help='Votes ahead of the runner-up that count as settled')
+    parser.add_argument('--deadline-ms', type=int, help='Local OCR latency budget in milliseconds')
+    parser.add_argument('--crop', action='store_true', help='Crop to the text region before upscaling and OCR')
+    parser.add_argument('--resolution', choices=['fixed', 'adaptive'], default='fixed',
+                        help='Upscale small images by a fixed factor or by measured glyph height')
+    parser.add_argument('--scale', type=positive_int, help='Force this upscaling factor (1 = original size)')
+    parser.add_argument('--buffer-pool', action='store_true',
+                        help='Reuse preprocessing buffers and kernels across images (always on for -d/--stdin)')
+    parser.add_argument('--mosaic', action='store_true', help='OCR all preprocessing variants in one call per config')
+    parser.add_argument('--single-pass', action='store_true',
+                        help='One OCR call per (psm, oem); derive whitelisted readings from character alternatives')
+    parser.add_argument('--consensus', choices=['exact', 'characters'], default='exact',
+                        help='Vote on whole readings or per character position')
+    parser.add_argument('--preprocess', metavar='FILE', help='Preprocessing spec (JSON) to use instead of the built-in one')
+    parser.add_argument('--preprocess-export', metavar='FILE',
+                        help='Save the preprocessing spec in use (with stage costs measured by --bench)')
+    parser.add_argument('--glyphs', metavar='MODEL', help='Also read characters with a trained glyph model (.npz)')
+    parser.add_argument('--glyph-threshold', type=float,
+                        help='Skip Tesseract when the glyph reading is at least this confident (0-100)')
+    parser.add_argument('--train-glyphs', metavar='DIR', help='Train a glyph model on a labeled directory or .npz corpus')
+    parser.add_argument('--glyph-output', default='glyph_model.npz', help='Where --train-glyphs saves the model')
+    parser.add_argument('--profile-grid', metavar='DIR', help='Profile preprocessing/OCR pairs on a labeled directory or .npz corpus')
+    parser.add_argument('--profile-output', default='grid_profile.json', help='Where --profile-grid saves the profile')
+    parser.add_argument('--grid-profile', metavar='FILE', help='Only run the best pairs of a saved grid profile')
+    parser.add_argument('--top-k', type=int, help='Run at most this many profiled pairs with hits (default: all of them)')
+    parser.add_argument('--bench', metavar='DIR', help='Benchmark the local OCR pipeline on a labeled directory or .npz corpus')
+    parser.add_argument('--bench-output', default='bench_results.json', help='Where --bench saves its JSON report')
+    parser.add_argument('--make-corpus', metavar='FILE', help='Generate a seeded synthetic labeled corpus (.npz)')
+    parser.add_argument('--corpus-size', type=int, default=200, help='Images --make-corpus generates')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed for --make-corpus')
+    parser.add_argument('--bench-compare', nargs=2, metavar=('OLD', 'NEW'), help='Compare two benchmark reports')
+    parser.add_argument('--telemetry', metavar='FILE', help='Append structured timing events to a JSON-lines file')
+    parser.add_argument('--cache', metavar='FILE', help='Reuse results for images already solved (sqlite file)')
+    parser.add_argument('--cache-near', action='store_true', help='Also reuse results of near-duplicate images')
+    parser.add_argument('-d', '--dir', help='Solve every image in a directory (local OCR, JSON lines)')
+    parser.add_argument('--stdin', action='store_true', help='Read image paths to solve from stdin, one per line')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1, help='Worker processes for -d/--stdin')
+    parser.add_argument('-o', '--output', help='JSON-lines output file for -d/--stdin (default: stdout)')
     
     args = parser.parse_args()
     
+    # Benchmark comparison only reads two reports
+    if args.bench_compare:
+        regressions = compare_benchmarks(*args.bench_compare)
+        exit(1 if regressions else 0)
+    
+    if args.make_corpus:
+        generate_corpus(args.make_corpus, args.corpus_size, args.seed)
+        print(f"💾 {args.corpus_size} synthetic images (seed {args.seed}) saved to {args.make_corpus}")
+        exit(0)
+    
+    options = {
+        'workers': args.workers,
+        'early_exit': args.early_exit,
+        'early_exit_margin': args.margin,
+        'deadline_ms': args.deadline_ms,
+        'crop_text': args.crop,
+        'resolution': args.resolution,
+        'scale': args.scale,
+        'buffer_pool': args.buffer_pool,
+        'mosaic': args.mosaic,
+        'single_pass': args.single_pass,
+        'glyph_model': args.glyphs,
+        'glyph_threshold': args.glyph_threshold,
+        'consensus': args.consensus,
+        'preprocess': args.preprocess,
+        'grid_profile': args.grid_profile,
+        'top_k': args.top_k
+    }
+    
+    # Batch mode: quiet local OCR in worker processes, one JSON line per image;
+    # workers open the cache and telemetry file themselves
+    if args.dir or args.stdin:
+        paths = iter_image_paths(args.dir, sys.stdin if args.stdin else None)
+        if args.output:
+            with open(args.output, 'w') as output:
+                run_batch(paths, options, args.jobs, output, args.cache, args.cache_near, args.telemetry)
+        else:
+            run_batch(paths, options, args.jobs, sys.stdout, args.cache, args.cache_near, args.telemetry)
+        exit(0)
+    
     # Reset command - only clears and exits
     if args.reset:
         solver = S0lvCaptcha()
         solver.reset_config()
         exit(0)
     
+    options.update({
+        'telemetry': Telemetry(JsonLinesSink(args.telemetry)) if args.telemetry else None,
+        'cache': ResultCache(path=args.cache, near_duplicates=args.cache_near) if args.cache else None,
+        'quiet': False
+    })
+    
+    # Local-only commands skip the banner, prompts and saved APIs
+    if args.profile_grid or args.bench or args.train_glyphs or args.preprocess_export:
+        solver = S0lvCaptcha(SolverConfig(**options))
+        report = None
+        if args.train_glyphs:
+            solver.train_glyph_model(args.train_glyphs, args.glyph_output)
+        elif args.profile_grid:
+            solver.profile_grid(args.profile_grid, args.profile_output)
+        elif args.bench:
+            report = solver.benchmark(args.bench, args.bench_output)
+        if args.preprocess_export:
+            solver.save_preprocess_spec(args.preprocess_export, report and report['stage_ms_per_image'])
+        exit(0)
+    
     # Create solver
     solver = S0lvCaptcha()
+    solver.apply_config(SolverConfig(services=solver.services, **options))
     
     # Config command
     if args.config: